@@ -1,6 +1,10 @@
 from . import config as config
 from . import constants as constants
 from .bot import Substiify as Substiify
+from .outbox import Outbox as Outbox
+from .outbox import OutboxMessage as OutboxMessage
+from .users import StoredUser as StoredUser
+from .users import UserResolver as UserResolver
 
 try:
 	from importlib.resources import files as _files
@@ -8,7 +8,9 @@ from discord.ext import commands
 
 import core
 from database import Database
-from database import db_constants as dbc
+
+from .outbox import Outbox
+from .users import UserResolver
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +18,8 @@ logger = logging.getLogger(__name__)
 class Substiify(commands.Bot):
 	def __init__(self, *, database: Database) -> None:
 		self.db = database
+		self.user_resolver = UserResolver(self)
+		self.outbox = Outbox(self)
 		self.version = core.__version__
 		self.start_time = datetime.datetime.now(datetime.timezone.utc)
 		prefix = core.config.BOT_PREFIX
@@ -36,6 +40,7 @@ class Substiify(commands.Bot):
 	async def setup_hook(self) -> None:
 		await self.load_extension("core.events")
 		await self.load_extension("extensions")
+		self.outbox.start()
 
 		url = core.config.LAVALINK_NODE_URL
 		password = core.config.LAVALINK_PASSWORD
@@ -46,6 +51,10 @@ class Substiify(commands.Bot):
 		else:
 			logger.warning("Lavalink is not configured. Skipping connection.")
 
+	async def close(self) -> None:
+		await self.outbox.close()
+		await super().close()
+
 	async def on_wavelink_node_ready(self, payload: wavelink.NodeReadyEventPayload) -> None:
 		logging.info(f"Wavelink Node connected: {payload.node!r} | Resumed: {payload.resumed}")
 
@@ -175,9 +184,7 @@ class Substiify(commands.Bot):
 			return
 		command_name = command.qualified_name
 		try:
-			await self.db.pool.execute(
-				dbc.USER_INSERT_QUERY, ctx.author.id, ctx.author.name, ctx.author.display_avatar.url
-			)
+			await self.db._insert_user(ctx.author)
 			if ctx.guild:
 				await self.db._insert_foundation(ctx.author, ctx.guild, ctx.channel)
 			else:
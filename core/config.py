@@ -19,6 +19,8 @@ LAVALINK_PASSWORD = os.getenv("LAVALINK_PASSWORD")
 
 SPOTIFY_URLS_ENABLED = os.getenv("SPOTIFY_URLS_ENABLED", "false").lower() == "true"
 
+KARMA_VOTE_DEBOUNCE_SECONDS = os.getenv("KARMA_VOTE_DEBOUNCE_SECONDS", "1.5")
+
 
 def validate() -> str:
 	required = {
@@ -48,4 +50,11 @@ def validate() -> str:
 	if lavalink_url_configured != lavalink_password_configured:
 		raise RuntimeError("LAVALINK_NODE_URL and LAVALINK_PASSWORD must be configured together")
 
+	try:
+		vote_debounce = float(KARMA_VOTE_DEBOUNCE_SECONDS)
+	except ValueError:
+		vote_debounce = -1.0
+	if vote_debounce < 0:
+		raise RuntimeError("KARMA_VOTE_DEBOUNCE_SECONDS must be a non-negative number")
+
 	return validated["BOT_TOKEN"]
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+import discord
+from asyncpg import Connection, Record
+
+if TYPE_CHECKING:
+	from .bot import Substiify
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_CONCURRENCY = 5
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_POLL_INTERVAL = 5.0
+OUTBOX_ROUTE_SPACING = 1.0
+OUTBOX_LEASE_SECONDS = 300
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE_SECONDS = 10
+OUTBOX_MAX_RETRY_SECONDS = 3600
+OUTBOX_PURGE_INTERVAL = 3600
+
+ENQUEUE_QUERY = """INSERT INTO outbox (kind, target_id, message_id, payload, dedupe_key)
+                   SELECT * FROM unnest($1::varchar[], $2::bigint[], $3::bigint[], $4::jsonb[], $5::varchar[])
+                   ON CONFLICT (dedupe_key) DO NOTHING"""
+
+# Leases due entries so a crashed delivery is retried once the lease runs out.
+CLAIM_QUERY = """UPDATE outbox
+                 SET attempts = attempts + 1, next_attempt_at = NOW() + make_interval(secs => $2)
+                 WHERE id IN (
+                     SELECT id FROM outbox
+                     WHERE completed_at IS NULL AND next_attempt_at <= NOW()
+                     ORDER BY id
+                     LIMIT $1
+                     FOR UPDATE SKIP LOCKED
+                 )
+                 RETURNING id, kind, target_id, message_id, payload, attempts"""
+
+COMPLETE_QUERY = "UPDATE outbox SET completed_at = NOW(), last_error = $2 WHERE id = $1"
+RETRY_QUERY = "UPDATE outbox SET next_attempt_at = NOW() + make_interval(secs => $2), last_error = $3 WHERE id = $1"
+PURGE_QUERY = "DELETE FROM outbox WHERE completed_at < NOW() - INTERVAL '7 days'"
+
+
+class _UndeliverableError(Exception):
+	pass
+
+
+def _payload(content: str | None, embed: discord.Embed | None) -> dict[str, Any]:
+	payload: dict[str, Any] = {}
+	if content is not None:
+		payload["content"] = content
+	if embed is not None:
+		payload["embed"] = embed.to_dict()
+	return payload
+
+
+@dataclass(frozen=True, slots=True)
+class OutboxMessage:
+	"""A DM, channel message or message edit waiting to be delivered by the outbox worker.
+
+	Messages with a `dedupe_key` are only enqueued once, which makes enqueueing safe to repeat.
+	"""
+
+	kind: str
+	target_id: int
+	payload: dict[str, Any] = field(default_factory=dict)
+	message_id: int | None = None
+	dedupe_key: str | None = None
+
+	@classmethod
+	def dm(
+		cls,
+		user_id: int,
+		*,
+		content: str | None = None,
+		embed: discord.Embed | None = None,
+		dedupe_key: str | None = None,
+	) -> "OutboxMessage":
+		return cls("dm", user_id, _payload(content, embed), dedupe_key=dedupe_key)
+
+	@classmethod
+	def message(
+		cls,
+		channel_id: int,
+		*,
+		content: str | None = None,
+		embed: discord.Embed | None = None,
+		dedupe_key: str | None = None,
+	) -> "OutboxMessage":
+		return cls("message", channel_id, _payload(content, embed), dedupe_key=dedupe_key)
+
+	@classmethod
+	def edit(
+		cls,
+		channel_id: int,
+		message_id: int,
+		*,
+		content: str | None = None,
+		embed: discord.Embed | None = None,
+		dedupe_key: str | None = None,
+	) -> "OutboxMessage":
+		return cls("edit", channel_id, _payload(content, embed), message_id=message_id, dedupe_key=dedupe_key)
+
+
+class Outbox:
+	"""Persistent queue of outgoing messages, delivered in the background by a single worker.
+
+	Entries of the same route (DM recipient or channel) are sent one after another with
+	`OUTBOX_ROUTE_SPACING` seconds in between, while up to `OUTBOX_CONCURRENCY` routes are served at once.
+	Failed deliveries are retried with exponential backoff.
+	"""
+
+	def __init__(self, bot: "Substiify") -> None:
+		self.bot = bot
+		self._wakeup = asyncio.Event()
+		self._semaphore = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+		self._worker: asyncio.Task | None = None
+		self.delivered = 0
+		self.retried = 0
+		self.dropped = 0
+
+	def start(self) -> None:
+		if self._worker is None:
+			self._worker = asyncio.create_task(self._run())
+
+	async def close(self) -> None:
+		if self._worker is None:
+			return
+		self._worker.cancel()
+		try:
+			await self._worker
+		except asyncio.CancelledError:
+			pass
+		self._worker = None
+
+	async def enqueue(self, *messages: OutboxMessage, connection: Connection | None = None) -> None:
+		"""Stores the messages for delivery. Pass a connection to enqueue inside a running transaction."""
+		if not messages:
+			return
+		await (connection or self.bot.db.pool).execute(
+			ENQUEUE_QUERY,
+			[message.kind for message in messages],
+			[message.target_id for message in messages],
+			[message.message_id for message in messages],
+			[json.dumps(message.payload) for message in messages],
+			[message.dedupe_key for message in messages],
+		)
+		self._wakeup.set()
+
+	async def _run(self) -> None:
+		await self.bot.wait_until_ready()
+		last_purge = 0.0
+		while True:
+			claimed = 0
+			try:
+				claimed = await self._deliver_due()
+				if time.monotonic() - last_purge > OUTBOX_PURGE_INTERVAL:
+					await self.bot.db.pool.execute(PURGE_QUERY)
+					last_purge = time.monotonic()
+			except Exception:
+				logger.exception("Failed to process the outbox")
+			if claimed >= OUTBOX_BATCH_SIZE:
+				continue
+			try:
+				await asyncio.wait_for(self._wakeup.wait(), timeout=OUTBOX_POLL_INTERVAL)
+			except asyncio.TimeoutError:
+				pass
+			self._wakeup.clear()
+
+	async def _deliver_due(self) -> int:
+		entries = await self.bot.db.pool.fetch(CLAIM_QUERY, OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS)
+		routes: dict[tuple[str, int], list[Record]] = {}
+		for entry in entries:
+			route = ("dm" if entry["kind"] == "dm" else "channel", entry["target_id"])
+			routes.setdefault(route, []).append(entry)
+		await asyncio.gather(*[self._deliver_route(route_entries) for route_entries in routes.values()])
+		return len(entries)
+
+	async def _deliver_route(self, entries: list[Record]) -> None:
+		async with self._semaphore:
+			for index, entry in enumerate(entries):
+				if index:
+					await asyncio.sleep(OUTBOX_ROUTE_SPACING)
+				await self._deliver(entry)
+
+	async def _deliver(self, entry: Record) -> None:
+		try:
+			await self._send(entry)
+		except (discord.Forbidden, discord.NotFound, _UndeliverableError) as error:
+			await self._drop(entry, f"{type(error).__name__}: {error}")
+		except discord.HTTPException as error:
+			if error.status == 429 or error.status >= 500:
+				await self._retry(entry, f"HTTP {error.status}: {error}")
+			else:
+				await self._drop(entry, f"HTTP {error.status}: {error}")
+		except Exception as error:
+			logger.exception(f"Failed to deliver outbox entry {entry['id']}")
+			await self._retry(entry, repr(error))
+		else:
+			self.delivered += 1
+			await self.bot.db.pool.execute(COMPLETE_QUERY, entry["id"], None)
+
+	async def _send(self, entry: Record) -> None:
+		payload = json.loads(entry["payload"])
+		kwargs: dict[str, Any] = {}
+		if "content" in payload:
+			kwargs["content"] = payload["content"]
+		if "embed" in payload:
+			kwargs["embed"] = discord.Embed.from_dict(payload["embed"])
+
+		if entry["kind"] == "dm":
+			user = await self.bot.user_resolver.fetch(entry["target_id"])
+			if user is None:
+				raise _UndeliverableError("unknown user")
+			await user.send(**kwargs)
+			return
+
+		channel = self.bot.get_partial_messageable(entry["target_id"])
+		if entry["kind"] == "edit":
+			await channel.get_partial_message(entry["message_id"]).edit(**kwargs)
+		else:
+			await channel.send(**kwargs)
+
+	async def _retry(self, entry: Record, error: str) -> None:
+		if entry["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+			return await self._drop(entry, error)
+		self.retried += 1
+		delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (entry["attempts"] - 1), OUTBOX_MAX_RETRY_SECONDS)
+		await self.bot.db.pool.execute(RETRY_QUERY, entry["id"], delay, error)
+
+	async def _drop(self, entry: Record, error: str) -> None:
+		self.dropped += 1
+		logger.warning(
+			f"Dropped outbox {entry['kind']} to {entry['target_id']} after {entry['attempts']} attempts: {error}"
+		)
+		await self.bot.db.pool.execute(COMPLETE_QUERY, entry["id"], error)
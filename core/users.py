@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import discord
+
+if TYPE_CHECKING:
+	from .bot import Substiify
+
+logger = logging.getLogger(__name__)
+
+MISSING_USER_TTL = 3600
+
+STORED_USERS_QUERY = (
+	"SELECT discord_user_id, username, avatar FROM discord_user WHERE discord_user_id = ANY($1::bigint[])"
+)
+
+
+@dataclass(frozen=True, slots=True)
+class StoredUser:
+	"""User row from the discord_user table, used for display when the user is not in the gateway cache."""
+
+	id: int
+	name: str
+	avatar: str | None
+
+	@property
+	def mention(self) -> str:
+		return f"<@{self.id}>"
+
+	def __str__(self) -> str:
+		return self.name
+
+
+class UserResolver:
+	"""Resolves user ids through the gateway cache, the discord_user table and finally the API.
+
+	Concurrent API fetches of the same id share one request and users the API reports as
+	unknown are not requested again for `MISSING_USER_TTL` seconds.
+	"""
+
+	def __init__(self, bot: "Substiify") -> None:
+		self.bot = bot
+		self._pending: dict[int, asyncio.Task[discord.User | None]] = {}
+		self._missing: dict[int, float] = {}
+		self.cache_hits = 0
+		self.database_hits = 0
+		self.api_fetches = 0
+
+	def _is_missing(self, user_id: int) -> bool:
+		expires_at = self._missing.get(user_id)
+		if expires_at is None:
+			return False
+		if expires_at < time.monotonic():
+			del self._missing[user_id]
+			return False
+		return True
+
+	async def fetch(self, user_id: int) -> discord.User | None:
+		"""Returns a full user object, which is needed to send DMs. Returns None for unknown users."""
+		user = self.bot.get_user(user_id)
+		if user is not None:
+			self.cache_hits += 1
+			return user
+		if self._is_missing(user_id):
+			return None
+
+		pending = self._pending.get(user_id)
+		if pending is None:
+			pending = self._pending[user_id] = asyncio.create_task(self._fetch_from_api(user_id))
+			pending.add_done_callback(lambda _: self._pending.pop(user_id, None))
+		return await asyncio.shield(pending)
+
+	async def _fetch_from_api(self, user_id: int) -> discord.User | None:
+		self.api_fetches += 1
+		try:
+			return await self.bot.fetch_user(user_id)
+		except discord.NotFound:
+			logger.warning(f"User {user_id} does not exist anymore")
+			self._missing[user_id] = time.monotonic() + MISSING_USER_TTL
+			return None
+
+	async def resolve(self, user_id: int) -> discord.User | StoredUser | None:
+		"""Returns a user suitable for display (name and mention). Returns None for unknown users."""
+		users = await self.resolve_many([user_id])
+		return users.get(user_id)
+
+	async def resolve_many(self, user_ids: Iterable[int]) -> dict[int, discord.User | StoredUser]:
+		"""Resolves many users for display with at most one database query. Unknown users are left out."""
+		resolved: dict[int, discord.User | StoredUser] = {}
+		unresolved: list[int] = []
+		for user_id in dict.fromkeys(user_ids):
+			user = self.bot.get_user(user_id)
+			if user is not None:
+				self.cache_hits += 1
+				resolved[user_id] = user
+			elif not self._is_missing(user_id):
+				unresolved.append(user_id)
+		if not unresolved:
+			return resolved
+
+		for record in await self.bot.db.pool.fetch(STORED_USERS_QUERY, unresolved):
+			if record["username"] is None:
+				continue
+			self.database_hits += 1
+			user_id = record["discord_user_id"]
+			resolved[user_id] = StoredUser(user_id, record["username"], record["avatar"])
+
+		unresolved = [user_id for user_id in unresolved if user_id not in resolved]
+		users = await asyncio.gather(*[self.fetch(user_id) for user_id in unresolved])
+		resolved.update({user.id: user for user in users if user is not None})
+		return resolved
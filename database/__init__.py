@@ -1,6 +1,7 @@
 import asyncio
 import logging
 import os
+from collections import OrderedDict
 from typing import Any, Protocol, Self
 
 import asyncpg
@@ -15,17 +16,50 @@ __all__ = ("Database",)
 
 logger: logging.Logger = logging.getLogger(__name__)
 
+FOUNDATION_CACHE_SIZE = 10_000
+
 
 class _DiscordChannel(Protocol):
 	@property
 	def id(self) -> int: ...
 
 
+class _FoundationCache:
+	"""LRU of user/server/channel rows that were already persisted with a given content fingerprint."""
+
+	def __init__(self, limit: int) -> None:
+		self.limit = limit
+		self.rows: OrderedDict[tuple[str, int], int] = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def is_persisted(self, key: tuple[str, int], fingerprint: int) -> bool:
+		if self.rows.get(key) != fingerprint:
+			self.misses += 1
+			return False
+		self.rows.move_to_end(key)
+		self.hits += 1
+		return True
+
+	def remember(self, key: tuple[str, int], fingerprint: int) -> None:
+		self.rows[key] = fingerprint
+		self.rows.move_to_end(key)
+		while len(self.rows) > self.limit:
+			self.rows.popitem(last=False)
+
+	def clear(self) -> None:
+		self.rows.clear()
+
+	def __len__(self) -> int:
+		return len(self.rows)
+
+
 class Database:
 	pool: asyncpg.Pool
 
 	def __init__(self, dsn: str) -> None:
 		self.dsn = dsn
+		self.foundation_cache = _FoundationCache(FOUNDATION_CACHE_SIZE)
 
 	async def __aenter__(self) -> Self:
 		await self.setup()
@@ -58,13 +92,18 @@ class Database:
 		guild: discord.Guild | None,
 		channel: _DiscordChannel,
 	) -> None:
-		async with self.pool.acquire() as connection:
-			async with connection.transaction():
-				if guild is None:
-					await connection.execute(USER_INSERT_QUERY, user.id, user.name, user.display_avatar.url)
-					await self._insert_server_channel(channel, connection=connection)
-				else:
-					await self._insert_foundation(user, guild, channel, connection=connection)
+		try:
+			async with self.pool.acquire() as connection:
+				async with connection.transaction():
+					if guild is None:
+						await self._insert_user(user, connection=connection)
+						await self._insert_server_channel(channel, connection=connection)
+					else:
+						await self._insert_foundation(user, guild, channel, connection=connection)
+		except Exception:
+			# Rows remembered inside the rolled back transaction were never persisted.
+			self.foundation_cache.clear()
+			raise
 
 	async def _insert_foundation(
 		self,
@@ -74,20 +113,43 @@ class Database:
 		*,
 		connection: asyncpg.Connection | None = None,
 	) -> None:
-		executor = connection or self.pool
-		await executor.execute(USER_INSERT_QUERY, user.id, user.name, user.display_avatar.url)
+		await self._insert_user(user, connection=connection)
 		await self._insert_server(server, connection=connection)
 
 		if pchannel := channel.parent if isinstance(channel, discord.Thread) else None:
-			await executor.execute(MESSAGEABLE_INSERT_QUERY, pchannel.id, pchannel.name, pchannel.guild.id, None)
+			await self._upsert_foundation_row(
+				"discord_channel",
+				MESSAGEABLE_INSERT_QUERY,
+				pchannel.id,
+				pchannel.name,
+				pchannel.guild.id,
+				None,
+				connection=connection,
+			)
 
 		p_chan_id = pchannel.id if pchannel else None
 		channel_name = getattr(channel, "name", None) or str(channel)
-		await executor.execute(MESSAGEABLE_INSERT_QUERY, channel.id, channel_name, server.id, p_chan_id)
+		await self._upsert_foundation_row(
+			"discord_channel",
+			MESSAGEABLE_INSERT_QUERY,
+			channel.id,
+			channel_name,
+			server.id,
+			p_chan_id,
+			connection=connection,
+		)
+
+	async def _insert_user(
+		self, user: discord.User | discord.Member, *, connection: asyncpg.Connection | None = None
+	) -> None:
+		await self._upsert_foundation_row(
+			"discord_user", USER_INSERT_QUERY, user.id, user.name, user.display_avatar.url, connection=connection
+		)
 
 	async def _insert_server(self, guild: discord.Guild, *, connection: asyncpg.Connection | None = None) -> None:
-		executor = connection or self.pool
-		await executor.execute(SERVER_INSERT_QUERY, guild.id, guild.name)
+		await self._upsert_foundation_row(
+			"discord_server", SERVER_INSERT_QUERY, guild.id, guild.name, connection=connection
+		)
 
 	async def _insert_server_channel(
 		self,
@@ -98,5 +160,23 @@ class Database:
 		guild = getattr(channel, "guild", None)
 		server_id = guild.id if guild is not None else None
 		channel_name = getattr(channel, "name", None) or str(channel)
+		await self._upsert_foundation_row(
+			"discord_channel", CHANNEL_INSERT_QUERY, channel.id, channel_name, server_id, connection=connection
+		)
+
+	async def _upsert_foundation_row(
+		self,
+		table: str,
+		query: str,
+		row_id: int,
+		*values: Any,
+		connection: asyncpg.Connection | None = None,
+	) -> None:
+		"""Runs a foundation upsert unless the row was already persisted with the same content."""
+		key = (table, row_id)
+		fingerprint = hash((query, values))
+		if self.foundation_cache.is_persisted(key, fingerprint):
+			return
 		executor = connection or self.pool
-		await executor.execute(CHANNEL_INSERT_QUERY, channel.id, channel_name, server_id)
+		await executor.execute(query, row_id, *values)
+		self.foundation_cache.remember(key, fingerprint)
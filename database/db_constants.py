@@ -4,6 +4,8 @@ USER_INSERT_QUERY = """INSERT INTO discord_user
                        ON CONFLICT (discord_user_id) DO UPDATE SET
                        username = EXCLUDED.username,
                        avatar = EXCLUDED.avatar
+                       WHERE discord_user.username IS DISTINCT FROM EXCLUDED.username
+                       OR discord_user.avatar IS DISTINCT FROM EXCLUDED.avatar
                     """
 
 SERVER_INSERT_QUERY = """INSERT INTO discord_server
@@ -11,6 +13,7 @@ SERVER_INSERT_QUERY = """INSERT INTO discord_server
                          VALUES ($1, $2)
                          ON CONFLICT (discord_server_id) DO UPDATE SET
                          server_name = EXCLUDED.server_name
+                         WHERE discord_server.server_name IS DISTINCT FROM EXCLUDED.server_name
                       """
 
 CHANNEL_INSERT_QUERY = """INSERT INTO discord_channel
@@ -18,6 +21,7 @@ CHANNEL_INSERT_QUERY = """INSERT INTO discord_channel
                            VALUES ($1, $2, $3)
                            ON CONFLICT (discord_channel_id) DO UPDATE SET
                            channel_name = EXCLUDED.channel_name
+                           WHERE discord_channel.channel_name IS DISTINCT FROM EXCLUDED.channel_name
                          """
 
 MESSAGEABLE_INSERT_QUERY = """INSERT INTO discord_channel
@@ -26,4 +30,6 @@ MESSAGEABLE_INSERT_QUERY = """INSERT INTO discord_channel
                           ON CONFLICT (discord_channel_id) DO UPDATE SET
                           channel_name = EXCLUDED.channel_name,
                           parent_discord_channel_id = EXCLUDED.parent_discord_channel_id
+                          WHERE discord_channel.channel_name IS DISTINCT FROM EXCLUDED.channel_name
+                          OR discord_channel.parent_discord_channel_id IS DISTINCT FROM EXCLUDED.parent_discord_channel_id
                        """
@@ -84,7 +84,9 @@ class Feedback(commands.Cog):
 		color = discord.Colour.green() if is_accepted else discord.Colour.red()
 		emoji = ACCEPT_EMOJI if is_accepted else DENY_EMOJI
 
-		user = self.bot.get_user(feedback["discord_user_id"]) or await self.bot.fetch_user(feedback["discord_user_id"])
+		user = await self.bot.user_resolver.resolve(feedback["discord_user_id"])
+		if user is None:
+			return
 
 		new_embed = discord.Embed(
 			title=f"{feedback_type.value.capitalize()} submission",
@@ -92,7 +94,14 @@ class Feedback(commands.Cog):
 			color=color,
 		)
 		message_to_user = f"Hello {user.name}!\nYour {self.bot.user.mention} {feedback_type.value} submission has been **{outcome}** {emoji}."
-		await user.send(content=message_to_user, embed=new_embed)
+		await self.bot.outbox.enqueue(
+			core.OutboxMessage.dm(
+				user.id,
+				content=message_to_user,
+				embed=new_embed,
+				dedupe_key=f"feedback:{feedback['id']}:{outcome}",
+			)
+		)
 
 	@commands.cooldown(2, 100)
 	@app_commands.command(
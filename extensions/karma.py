@@ -1,48 +1,1026 @@
+import contextlib
 import logging
+import math
 import re
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
 
 import discord
 import asyncio
-from asyncpg import Record
+from asyncpg import Connection, Record
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 import core
 import utils
-from database import db_constants as dbc
 
 logger = logging.getLogger(__name__)
 
 
 UPSERT_KARMA_QUERY = """INSERT INTO karma (discord_user_id, discord_server_id, amount) VALUES ($1, $2, $3)
                         ON CONFLICT (discord_user_id, discord_server_id) DO UPDATE SET amount = karma.amount + $3"""
-UPSERT_POST_VOTES_QUERY = """INSERT INTO post (discord_user_id, discord_server_id, discord_channel_id, discord_message_id, created_at, upvotes, downvotes)
-                             VALUES ($1, $2, $3, $4, $5, $6, $7)
-                             ON CONFLICT (discord_message_id) DO UPDATE SET upvotes = post.upvotes + $6, downvotes = post.downvotes + $7"""
+# Moves karma between two users in one statement. The debit only happens if the donator has enough karma,
+# and the receiver is only created and credited if the debit happened.
+DONATE_KARMA_QUERY = """WITH donator AS (
+                            SELECT amount FROM karma WHERE discord_user_id = $1 AND discord_server_id = $3
+                        ), debit AS (
+                            UPDATE karma SET amount = karma.amount - $6
+                            WHERE discord_user_id = $1 AND discord_server_id = $3 AND amount >= $6
+                            RETURNING amount
+                        ), receiver AS (
+                            INSERT INTO discord_user (discord_user_id, username, avatar)
+                            SELECT $2, $4, $5 FROM debit
+                            ON CONFLICT (discord_user_id) DO UPDATE SET username = EXCLUDED.username, avatar = EXCLUDED.avatar
+                            WHERE discord_user.username IS DISTINCT FROM EXCLUDED.username OR discord_user.avatar IS DISTINCT FROM EXCLUDED.avatar
+                        ), credit AS (
+                            INSERT INTO karma (discord_user_id, discord_server_id, amount)
+                            SELECT $2, $3, $6 FROM debit
+                            ON CONFLICT (discord_user_id, discord_server_id) DO UPDATE SET amount = karma.amount + EXCLUDED.amount
+                            RETURNING amount
+                        )
+                        SELECT (SELECT amount FROM donator) AS previous_balance,
+                               (SELECT amount FROM debit) AS donator_balance,
+                               (SELECT amount FROM credit) AS receiver_balance"""
+# Overwrites the karma of users and returns every new balance with its difference to the old one.
+SET_KARMA_QUERY = """WITH balances AS (
+                         SELECT * FROM unnest($2::bigint[], $3::bigint[]) AS balances(discord_user_id, amount)
+                     ), previous AS (
+                         SELECT karma.discord_user_id, karma.amount
+                         FROM karma JOIN balances USING (discord_user_id)
+                         WHERE karma.discord_server_id = $1
+                     ), upserted AS (
+                         INSERT INTO karma (discord_user_id, discord_server_id, amount)
+                         SELECT discord_user_id, $1, amount FROM balances
+                         ON CONFLICT (discord_user_id, discord_server_id) DO UPDATE SET amount = EXCLUDED.amount
+                         RETURNING discord_user_id, amount
+                     )
+                     SELECT upserted.discord_user_id, upserted.amount, upserted.amount - COALESCE(previous.amount, 0) AS difference
+                     FROM upserted LEFT JOIN previous USING (discord_user_id)"""
+FLUSH_VOTES_QUERY = """WITH users AS (
+                           INSERT INTO discord_user (discord_user_id, username, avatar)
+                           SELECT * FROM unnest($1::bigint[], $2::varchar[], $3::varchar[])
+                           ON CONFLICT (discord_user_id) DO UPDATE SET username = EXCLUDED.username, avatar = EXCLUDED.avatar
+                           WHERE discord_user.username IS DISTINCT FROM EXCLUDED.username OR discord_user.avatar IS DISTINCT FROM EXCLUDED.avatar
+                           RETURNING 1
+                       ),
+                       servers AS (
+                           INSERT INTO discord_server (discord_server_id, server_name)
+                           SELECT * FROM unnest($4::bigint[], $5::varchar[])
+                           ON CONFLICT (discord_server_id) DO UPDATE SET server_name = EXCLUDED.server_name
+                           WHERE discord_server.server_name IS DISTINCT FROM EXCLUDED.server_name
+                           RETURNING 1
+                       ),
+                       channels AS (
+                           INSERT INTO discord_channel (discord_channel_id, channel_name, discord_server_id)
+                           SELECT * FROM unnest($6::bigint[], $7::varchar[], $8::bigint[])
+                           ON CONFLICT (discord_channel_id) DO UPDATE SET channel_name = EXCLUDED.channel_name
+                           WHERE discord_channel.channel_name IS DISTINCT FROM EXCLUDED.channel_name
+                           RETURNING 1
+                       ),
+                       karma_changes AS (
+                           INSERT INTO karma (discord_user_id, discord_server_id, amount)
+                           SELECT * FROM unnest($9::bigint[], $10::bigint[], $11::bigint[])
+                           ON CONFLICT (discord_user_id, discord_server_id) DO UPDATE SET amount = karma.amount + EXCLUDED.amount
+                           RETURNING 1
+                       ),
+                       new_posts AS (
+                           INSERT INTO post (discord_message_id, discord_user_id, discord_server_id, discord_channel_id, created_at, upvotes, downvotes)
+                           SELECT * FROM unnest($12::bigint[], $13::bigint[], $14::bigint[], $15::bigint[], $16::timestamp[], $17::bigint[], $18::bigint[])
+                           ON CONFLICT (discord_message_id) DO UPDATE SET upvotes = post.upvotes + EXCLUDED.upvotes, downvotes = post.downvotes + EXCLUDED.downvotes
+                           RETURNING 1
+                       ),
+                       post_votes AS (
+                           UPDATE post SET upvotes = post.upvotes + votes.upvotes, downvotes = post.downvotes + votes.downvotes
+                           FROM unnest($19::bigint[], $20::bigint[], $21::bigint[]) AS votes (discord_message_id, upvotes, downvotes)
+                           WHERE post.discord_message_id = votes.discord_message_id
+                           RETURNING 1
+                       )
+                       SELECT (SELECT COUNT(*) FROM users) + (SELECT COUNT(*) FROM servers) + (SELECT COUNT(*) FROM channels)
+                            + (SELECT COUNT(*) FROM karma_changes) + (SELECT COUNT(*) FROM new_posts) + (SELECT COUNT(*) FROM post_votes)"""
+
+VOTE_FLUSH_INTERVAL = 0.5
+VOTE_FLUSH_MAX_EVENTS = 200
+VOTE_BUFFER_MAX_EVENTS = 100_000
+VOTE_BUFFER_MAX_AGE = 3600.0
+MAX_INDEXED_MESSAGES = 3000
+MAX_INDEXED_AUTHORS = 200_000
+AUTHOR_PREWARM_LIMIT = 1000
+AUTO_REACTION_INTERVAL = 0.25
+AUTO_REACTION_QUEUE_LIMIT = 20
+AUTO_REACTION_MAX_AGE = 30.0
+REACTION_LOCK_STRIPES = 64
+LEADERBOARD_PAGE_SIZE = 15
+KARMA_STATS_CACHE_SECONDS = 60
+KASINO_RENDER_DELAY = 2.0
+LEDGER_COLUMNS = ("discord_user_id", "discord_server_id", "amount", "reason", "reference_id", "created_at")
+KARMA_SNAPSHOT_INTERVAL_HOURS = 6
+KARMA_TREND_DEFAULT_DAYS = 30
+KARMA_TREND_MAX_DAYS = 365
+KARMA_TREND_ROWS = 15
+
+# Appends ledger entries and adds them to the daily rollups in one statement.
+LEDGER_WRITE_QUERY = """WITH entries AS (
+                            SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::bigint[], $4::varchar[], $5::bigint[], $6::timestamp[])
+                                AS entries(discord_user_id, discord_server_id, amount, reason, reference_id, created_at)
+                        ), ledger AS (
+                            INSERT INTO karma_ledger (discord_user_id, discord_server_id, amount, reason, reference_id, created_at)
+                            SELECT * FROM entries
+                        )
+                        INSERT INTO karma_daily (discord_server_id, discord_user_id, day, gained, lost)
+                        SELECT discord_server_id, discord_user_id, created_at::date, SUM(GREATEST(amount, 0)), SUM(GREATEST(-amount, 0))
+                        FROM entries
+                        GROUP BY discord_server_id, discord_user_id, created_at::date
+                        ON CONFLICT (discord_server_id, discord_user_id, day) DO UPDATE
+                        SET gained = karma_daily.gained + EXCLUDED.gained, lost = karma_daily.lost + EXCLUDED.lost"""
+# Adds copied ledger entries, pre-aggregated per user and day, to the daily rollups.
+KARMA_DAILY_QUERY = """INSERT INTO karma_daily (discord_server_id, discord_user_id, day, gained, lost)
+                       SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::date[], $4::bigint[], $5::bigint[])
+                       ON CONFLICT (discord_server_id, discord_user_id, day) DO UPDATE
+                       SET gained = karma_daily.gained + EXCLUDED.gained, lost = karma_daily.lost + EXCLUDED.lost"""
+KARMA_TREND_QUERY = """SELECT day, gained, lost
+                       FROM karma_daily
+                       WHERE discord_server_id = $1 AND discord_user_id = $2 AND day >= $3
+                       ORDER BY day"""
+RECONCILE_BATCH_SIZE = 100
+RECONCILE_CONCURRENCY = 4
+RECONCILE_HISTORY_LIMIT = 1000
+
+RECONCILE_RESET_QUERY = """INSERT INTO post_reconciliation (discord_server_id) VALUES ($1)
+                           ON CONFLICT (discord_server_id) DO UPDATE
+                           SET phase = DEFAULT, last_message_id = DEFAULT, last_channel_id = DEFAULT, checked_posts = DEFAULT,
+                               corrected_posts = DEFAULT, started_at = DEFAULT, finished_at = DEFAULT
+                           RETURNING *"""
+RECONCILE_POSTS_QUERY = """SELECT discord_message_id, discord_user_id, discord_channel_id, created_at
+                           FROM post
+                           WHERE discord_server_id = $1 AND discord_message_id > $2
+                           ORDER BY discord_message_id
+                           LIMIT $3"""
+# Applies a batch of recounted posts: upserts the posts with their recounted votes, credits the karma
+# difference to the authors and advances the checkpoint, all in one statement. Returns the changed posts.
+RECONCILE_APPLY_QUERY = """WITH corrections AS (
+                               SELECT *
+                               FROM unnest($2::bigint[], $3::bigint[], $4::bigint[], $5::timestamp[], $6::bigint[], $7::bigint[])
+                                   AS corrections(discord_message_id, discord_user_id, discord_channel_id, created_at, upvotes, downvotes)
+                           ), users AS (
+                               INSERT INTO discord_user (discord_user_id, username, avatar)
+                               SELECT * FROM unnest($8::bigint[], $9::varchar[], $10::varchar[])
+                               ON CONFLICT (discord_user_id) DO NOTHING
+                           ), previous AS (
+                               SELECT post.discord_message_id, post.upvotes - post.downvotes AS score
+                               FROM post JOIN corrections USING (discord_message_id)
+                           ), upserted AS (
+                               INSERT INTO post (discord_message_id, discord_user_id, discord_server_id, discord_channel_id, created_at, upvotes, downvotes)
+                               SELECT discord_message_id, discord_user_id, $1, discord_channel_id, created_at, upvotes, downvotes
+                               FROM corrections
+                               ON CONFLICT (discord_message_id) DO UPDATE SET upvotes = EXCLUDED.upvotes, downvotes = EXCLUDED.downvotes
+                               WHERE (post.upvotes, post.downvotes) IS DISTINCT FROM (EXCLUDED.upvotes, EXCLUDED.downvotes)
+                               RETURNING post.discord_message_id, post.discord_user_id, post.upvotes - post.downvotes AS score
+                           ), differences AS (
+                               SELECT upserted.discord_message_id, upserted.discord_user_id,
+                                      upserted.score - COALESCE(previous.score, 0) AS karma_difference
+                               FROM upserted LEFT JOIN previous USING (discord_message_id)
+                           ), karma_changes AS (
+                               INSERT INTO karma (discord_user_id, discord_server_id, amount)
+                               SELECT discord_user_id, $1, SUM(karma_difference)
+                               FROM differences
+                               GROUP BY discord_user_id
+                               HAVING SUM(karma_difference) <> 0
+                               ON CONFLICT (discord_user_id, discord_server_id) DO UPDATE SET amount = karma.amount + EXCLUDED.amount
+                           ), checkpoint AS (
+                               UPDATE post_reconciliation
+                               SET phase = $11, last_message_id = $12, last_channel_id = $13,
+                                   checked_posts = checked_posts + $14,
+                                   corrected_posts = corrected_posts + (SELECT COUNT(*) FROM differences)
+                               WHERE discord_server_id = $1
+                           )
+                           SELECT * FROM differences"""
+
+# Locking the ledger waits for in-flight karma changes, so every ledger id up to the returned watermark is committed.
+# The lock is released with the short transaction that reads the watermark.
+KARMA_SNAPSHOT_LOCK_QUERY = "LOCK TABLE karma_ledger IN SHARE MODE"
+KARMA_WATERMARK_QUERY = "SELECT COALESCE(MAX(id), 0) FROM karma_ledger"
+# Rolls the ledger entries up to the watermark into karma_snapshot and returns every balance where karma disagrees
+# with the snapshot plus the newer entries. The CTEs read the previous snapshot, so the upsert does not affect them.
+KARMA_SNAPSHOT_QUERY = """WITH previous AS (
+                              SELECT COALESCE(MAX(ledger_id), 0) AS ledger_id FROM karma_snapshot
+                          ), advanced AS (
+                              SELECT discord_user_id, discord_server_id, SUM(amount)::bigint AS amount
+                              FROM (
+                                  SELECT discord_user_id, discord_server_id, amount FROM karma_snapshot
+                                  UNION ALL
+                                  SELECT discord_user_id, discord_server_id, amount
+                                  FROM karma_ledger, previous
+                                  WHERE karma_ledger.id > previous.ledger_id AND karma_ledger.id <= $1
+                              ) AS entries
+                              GROUP BY discord_user_id, discord_server_id
+                          ), snapshot AS (
+                              INSERT INTO karma_snapshot (discord_user_id, discord_server_id, amount, ledger_id)
+                              SELECT discord_user_id, discord_server_id, amount, $1 FROM advanced
+                              ON CONFLICT (discord_user_id, discord_server_id)
+                              DO UPDATE SET amount = EXCLUDED.amount, ledger_id = EXCLUDED.ledger_id
+                          ), expected AS (
+                              SELECT discord_user_id, discord_server_id, SUM(amount)::bigint AS amount
+                              FROM (
+                                  SELECT discord_user_id, discord_server_id, amount FROM advanced
+                                  UNION ALL
+                                  SELECT discord_user_id, discord_server_id, amount FROM karma_ledger WHERE id > $1
+                              ) AS entries
+                              GROUP BY discord_user_id, discord_server_id
+                          )
+                          SELECT COALESCE(expected.discord_user_id, karma.discord_user_id) AS discord_user_id,
+                                 COALESCE(expected.discord_server_id, karma.discord_server_id) AS discord_server_id,
+                                 COALESCE(expected.amount, 0) AS expected,
+                                 COALESCE(karma.amount, 0) AS actual
+                          FROM expected
+                          FULL JOIN karma ON karma.discord_user_id = expected.discord_user_id
+                                         AND karma.discord_server_id = expected.discord_server_id
+                          WHERE COALESCE(expected.amount, 0) <> COALESCE(karma.amount, 0)"""
+# Sets every drifted balance to the ledger balance, including karma without any ledger history.
+KARMA_REPAIR_QUERY = """INSERT INTO karma (discord_user_id, discord_server_id, amount)
+                        SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::bigint[])
+                        ON CONFLICT (discord_user_id, discord_server_id) DO UPDATE SET amount = EXCLUDED.amount
+                        RETURNING discord_user_id, discord_server_id, amount"""
+
+# Places or increases a bet and maintains the pool and participant counters of the kasino in the same statement.
+KASINO_BET_QUERY = """WITH bet AS (
+                          INSERT INTO kasino_bet (kasino_id, discord_user_id, amount, option)
+                          VALUES ($1, $2, $3, $4)
+                          ON CONFLICT (kasino_id, discord_user_id)
+                          DO UPDATE SET amount = kasino_bet.amount + EXCLUDED.amount
+                          RETURNING amount, option, (xmax = 0) AS inserted
+                      )
+                      UPDATE kasino
+                      SET option1_pool = kasino.option1_pool + CASE WHEN bet.option = 1 THEN $3 ELSE 0 END,
+                          option2_pool = kasino.option2_pool + CASE WHEN bet.option = 2 THEN $3 ELSE 0 END,
+                          participants = kasino.participants + CASE WHEN bet.inserted THEN 1 ELSE 0 END
+                      FROM bet
+                      WHERE kasino.id = $1
+                      RETURNING bet.amount AS total_bet, kasino.*"""
+
+# Everything the bet button needs to open the modal: the kasino, the balance and the existing bet of the user.
+KASINO_BET_STATE_QUERY = """SELECT kasino.id, kasino.question, kasino.option1, kasino.option2, kasino.locked,
+                                   karma.amount AS balance, kasino_bet.option AS bet_option
+                            FROM kasino
+                            LEFT JOIN karma ON karma.discord_user_id = $2 AND karma.discord_server_id = kasino.discord_server_id
+                            LEFT JOIN kasino_bet ON kasino_bet.kasino_id = kasino.id AND kasino_bet.discord_user_id = $2
+                            WHERE kasino.id = $1"""
+KASINO_CLOSE_QUERY = "SELECT * FROM kasino WHERE id = $1 FOR UPDATE"
+KASINO_BETS_QUERY = "SELECT discord_user_id, amount, option FROM kasino_bet WHERE kasino_id = $1 FOR UPDATE"
+
+# Credits the payouts of a kasino in one statement and returns the bet and resulting balance of every bettor.
+# The final SELECT sees karma as it was before the UPDATE, so bettors without a payout keep their old balance.
+KASINO_PAYOUT_QUERY = """WITH payouts AS (
+                             SELECT * FROM unnest($2::bigint[], $3::bigint[]) AS payouts(discord_user_id, amount)
+                         ), updated AS (
+                             UPDATE karma SET amount = karma.amount + payouts.amount
+                             FROM payouts
+                             WHERE karma.discord_server_id = $1 AND karma.discord_user_id = payouts.discord_user_id
+                             RETURNING karma.discord_user_id, karma.amount
+                         )
+                         SELECT bet.discord_user_id, bet.amount AS bet_amount, bet.option,
+                                COALESCE(updated.amount, karma.amount) AS balance
+                         FROM kasino_bet AS bet
+                         LEFT JOIN updated ON updated.discord_user_id = bet.discord_user_id
+                         LEFT JOIN karma ON karma.discord_user_id = bet.discord_user_id AND karma.discord_server_id = $1
+                         WHERE bet.kasino_id = $4
+                         ORDER BY bet.option, bet.amount DESC"""
+
+# Recomputes the counters of every kasino from its bets and fixes the ones that drifted.
+KASINO_RECONCILE_QUERY = """UPDATE kasino
+                            SET option1_pool = totals.option1_pool,
+                                option2_pool = totals.option2_pool,
+                                participants = totals.participants
+                            FROM (
+                                SELECT kasino.id,
+                                       COALESCE(SUM(bet.amount) FILTER (WHERE bet.option = 1), 0) AS option1_pool,
+                                       COALESCE(SUM(bet.amount) FILTER (WHERE bet.option = 2), 0) AS option2_pool,
+                                       COUNT(bet.id) AS participants
+                                FROM kasino
+                                LEFT JOIN kasino_bet AS bet ON bet.kasino_id = kasino.id
+                                GROUP BY kasino.id
+                            ) AS totals
+                            WHERE kasino.id = totals.id
+                              AND (kasino.option1_pool, kasino.option2_pool, kasino.participants)
+                                  IS DISTINCT FROM (totals.option1_pool, totals.option2_pool, totals.participants)
+                            RETURNING kasino.id"""
+
+POST_LEADERBOARD_WINDOWS = {1: "Top 5 All Time", 2: "Top 5 This Month", 3: "Top 5 This Week"}
+# Top 5 posts of every leaderboard window in one statement, the windows are static so the plan can be cached.
+POST_LEADERBOARD_QUERY = """
+	SELECT boards.board, top_posts.*
+	FROM (VALUES (1, NULL::interval), (2, INTERVAL '30 days'), (3, INTERVAL '7 days')) AS boards(board, period)
+	CROSS JOIN LATERAL (
+		SELECT *
+		FROM post
+		WHERE discord_server_id = $1
+			AND ($2::bigint IS NULL OR discord_user_id = $2)
+			AND (boards.period IS NULL OR created_at > NOW() - boards.period)
+		ORDER BY upvotes DESC
+		LIMIT 5
+	) AS top_posts
+	ORDER BY boards.board, top_posts.upvotes DESC
+"""
+
+# Server karma stats in one pass: window functions rank the users of the server once,
+# so the top percentile sums are plain filtered aggregates over that ranking.
+KARMA_STATS_QUERY = """
+	WITH ranked AS (
+		SELECT amount,
+			ROW_NUMBER() OVER (ORDER BY amount DESC NULLS LAST) AS position,
+			COUNT(*) OVER () AS user_count
+		FROM karma
+		WHERE discord_server_id = $1
+	), karma_stats AS (
+		SELECT SUM(amount) AS total_karma,
+			COUNT(*) AS karma_users,
+			COALESCE(SUM(amount) FILTER (WHERE position <= CEIL(0.1 * user_count)), 0) AS top_10_karma,
+			COALESCE(SUM(amount) FILTER (WHERE position <= CEIL(0.01 * user_count)), 0) AS top_1_karma
+		FROM ranked
+	), post_stats AS (
+		SELECT AVG(upvotes / downvotes) AS avg_ratio, COUNT(*) AS post_count
+		FROM post
+		WHERE discord_server_id = $1
+			AND upvotes >= 1
+			AND downvotes >= 1
+	)
+	SELECT * FROM karma_stats, post_stats
+"""
+
+DEFAULT_KARMA_EMOTES: tuple[frozenset[int], frozenset[int]] = (
+	frozenset({core.constants.UPVOTE_EMOTE_ID}),
+	frozenset({core.constants.DOWNVOTE_EMOTE_ID}),
+)
+
+
+@dataclass(slots=True)
+class _PendingPostVotes:
+	user_id: int
+	server_id: int
+	channel_id: int
+	created_at: datetime | None
+	upvotes: int = 0
+	downvotes: int = 0
+
+
+@dataclass(slots=True)
+class _VoteBatch:
+	"""Foundation rows and vote deltas that are written together by one flush."""
+
+	users: dict[int, tuple[str, str]] = field(default_factory=dict)
+	servers: dict[int, str] = field(default_factory=dict)
+	channels: dict[int, tuple[str, int]] = field(default_factory=dict)
+	karma: dict[tuple[int, int], int] = field(default_factory=dict)
+	posts: dict[int, _PendingPostVotes] = field(default_factory=dict)
+	events: int = 0
+	started: float | None = None
+
+	def merge(self, other: "_VoteBatch") -> None:
+		# Foundation rows from `other` are newer and replace ours.
+		self.users.update(other.users)
+		self.servers.update(other.servers)
+		self.channels.update(other.channels)
+		for karma_key, amount in other.karma.items():
+			self.karma[karma_key] = self.karma.get(karma_key, 0) + amount
+		for message_id, votes in other.posts.items():
+			self.add_post_votes(message_id, votes)
+		self.events += other.events
+		if self.started is None or (other.started is not None and other.started < self.started):
+			self.started = other.started
+
+	def add_post_votes(self, message_id: int, votes: _PendingPostVotes) -> None:
+		pending = self.posts.get(message_id)
+		if pending is None:
+			self.posts[message_id] = votes
+			return
+		pending.upvotes += votes.upvotes
+		pending.downvotes += votes.downvotes
+		if pending.created_at is None:
+			pending.created_at = votes.created_at
+
+	def query_args(self) -> tuple[list, ...]:
+		# Rows are written in key order, so concurrent statements lock shared karma and post rows in the same order.
+		users = dict(sorted(self.users.items()))
+		servers = dict(sorted(self.servers.items()))
+		channels = dict(sorted(self.channels.items()))
+		karma = dict(sorted(self.karma.items()))
+		posts = sorted(self.posts.items())
+		new_posts = {message_id: votes for message_id, votes in posts if votes.created_at is not None}
+		post_votes = {message_id: votes for message_id, votes in posts if votes.created_at is None}
+		return (
+			list(users),
+			[username for username, _ in users.values()],
+			[avatar for _, avatar in users.values()],
+			list(servers),
+			list(servers.values()),
+			list(channels),
+			[channel_name for channel_name, _ in channels.values()],
+			[server_id for _, server_id in channels.values()],
+			[user_id for user_id, _ in karma],
+			[server_id for _, server_id in karma],
+			list(karma.values()),
+			list(new_posts),
+			[votes.user_id for votes in new_posts.values()],
+			[votes.server_id for votes in new_posts.values()],
+			[votes.channel_id for votes in new_posts.values()],
+			[votes.created_at for votes in new_posts.values()],
+			[votes.upvotes for votes in new_posts.values()],
+			[votes.downvotes for votes in new_posts.values()],
+			list(post_votes),
+			[votes.upvotes for votes in post_votes.values()],
+			[votes.downvotes for votes in post_votes.values()],
+		)
+
+
+class _VoteBuffer:
+	"""Coalesces reaction writes in memory until they are flushed with a single statement."""
+
+	def __init__(self) -> None:
+		self.pending = _VoteBatch()
+		self.failed_attempts = 0
+		self.dropped_events = 0
+		self.flushes = 0
+		self.flushed_events = 0
+		self.flushed_rows = 0
+		self.last_flush_size = 0
+		self.total_flush_seconds = 0.0
+		self.max_flush_seconds = 0.0
+
+	def add(
+		self,
+		message_id: int,
+		votes: _PendingPostVotes,
+		karma_amount: int,
+		server: discord.Guild,
+		channel: discord.abc.GuildChannel | discord.Thread,
+		author: discord.abc.User | None = None,
+	) -> None:
+		pending = self.pending
+		if pending.started is None:
+			pending.started = time.monotonic()
+		if author is not None:
+			pending.users[author.id] = (author.name, author.display_avatar.url)
+		pending.servers[server.id] = server.name
+		pending.channels[channel.id] = (getattr(channel, "name", None) or str(channel), server.id)
+		karma_key = (votes.user_id, votes.server_id)
+		pending.karma[karma_key] = pending.karma.get(karma_key, 0) + karma_amount
+		pending.add_post_votes(message_id, votes)
+		pending.events += 1
+
+	def get_post_author(self, message_id: int) -> int | None:
+		votes = self.pending.posts.get(message_id)
+		return votes.user_id if votes is not None else None
+
+	def drain(self) -> _VoteBatch:
+		batch, self.pending = self.pending, _VoteBatch()
+		return batch
+
+	def restore(self, batch: _VoteBatch) -> None:
+		"""Puts a drained batch back so it is retried with the next flush."""
+		batch.merge(self.pending)
+		self.pending = batch
+
+	def exceeds(self, max_events: int, max_age: float) -> bool:
+		pending = self.pending
+		return pending.events > max_events or (
+			pending.started is not None and time.monotonic() - pending.started > max_age
+		)
+
+	def record_flush(self, events: int, rows: int, seconds: float) -> None:
+		self.flushes += 1
+		self.flushed_events += events
+		self.flushed_rows += rows
+		self.last_flush_size = events
+		self.total_flush_seconds += seconds
+		self.max_flush_seconds = max(self.max_flush_seconds, seconds)
+
+	def __len__(self) -> int:
+		return self.pending.events
+
+
+class _LockStripes:
+	"""Fixed set of locks that serializes work per key while unrelated keys rarely share a lock."""
+
+	def __init__(self, stripes: int) -> None:
+		self.locks = [asyncio.Lock() for _ in range(stripes)]
+		self.acquisitions = 0
+		self.contended = 0
+		self.total_wait_seconds = 0.0
+		self.max_wait_seconds = 0.0
+
+	@contextlib.asynccontextmanager
+	async def hold(self, key: int) -> AsyncIterator[None]:
+		# The low bits of a snowflake are a per-process counter, mixing in the timestamp spreads them evenly.
+		lock = self.locks[((key >> 22) ^ key) % len(self.locks)]
+		self.acquisitions += 1
+		if not lock.locked():
+			async with lock:
+				yield
+			return
+
+		self.contended += 1
+		started = time.perf_counter()
+		async with lock:
+			waited = time.perf_counter() - started
+			self.total_wait_seconds += waited
+			self.max_wait_seconds = max(self.max_wait_seconds, waited)
+			yield
+
+	def contention_ratio(self) -> float:
+		return self.contended / max(self.acquisitions, 1)
+
+
+class _MessageIndex:
+	"""Id-indexed view of recently seen guild messages, evicted in arrival order like the gateway cache."""
+
+	def __init__(self, limit: int) -> None:
+		self.limit = limit
+		self.messages: dict[int, discord.Message] = {}
+		self.hits = 0
+		self.misses = 0
+
+	def add(self, message: discord.Message) -> None:
+		self.messages[message.id] = message
+		while len(self.messages) > self.limit:
+			del self.messages[next(iter(self.messages))]
+
+	def get(self, message_id: int) -> discord.Message | None:
+		message = self.messages.get(message_id)
+		if message is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+		return message
+
+	def discard(self, message_id: int) -> None:
+		self.messages.pop(message_id, None)
+
+	def hit_ratio(self) -> float:
+		return self.hits / max(self.hits + self.misses, 1)
+
+	def __len__(self) -> int:
+		return len(self.messages)
+
+
+class _MessageAuthors:
+	"""Compact message id to author id map of vote channel posts, evicted in arrival order."""
+
+	def __init__(self, limit: int) -> None:
+		self.limit = limit
+		self.authors: dict[int, int] = {}
+		self.hits = 0
+		self.misses = 0
+		self.fetches = 0
+
+	def add(self, message_id: int, author_id: int) -> None:
+		self.authors[message_id] = author_id
+		while len(self.authors) > self.limit:
+			del self.authors[next(iter(self.authors))]
+
+	def get(self, message_id: int) -> int | None:
+		author_id = self.authors.get(message_id)
+		if author_id is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+		return author_id
+
+	def discard(self, message_id: int) -> None:
+		self.authors.pop(message_id, None)
+
+	def __len__(self) -> int:
+		return len(self.authors)
+
+
+class _AutoReactor:
+	"""Adds the vote reactions to new vote channel posts through one paced queue per channel.
+
+	Reactions share a rate limit bucket per channel, so each channel worker waits `interval` seconds between
+	reactions. During bursts the oldest posts are shed instead of letting the queue fall minutes behind.
+	"""
+
+	def __init__(self, bot: core.Substiify, interval: float, queue_limit: int, max_age: float) -> None:
+		self.bot = bot
+		self.interval = interval
+		self.queue_limit = queue_limit
+		self.max_age = max_age
+		self.queues: dict[int, deque[tuple[int, float]]] = {}
+		self.workers: dict[int, asyncio.Task] = {}
+		self._emojis: tuple[discord.Emoji, discord.Emoji] | None = None
+		self.queued = 0
+		self.reacted = 0
+		self.shed = 0
+		self.expired = 0
+		self.failed = 0
+
+	def emojis(self) -> tuple[discord.Emoji, discord.Emoji] | None:
+		if self._emojis is None:
+			upvote_emoji = self.bot.get_emoji(core.constants.UPVOTE_EMOTE_ID)
+			downvote_emoji = self.bot.get_emoji(core.constants.DOWNVOTE_EMOTE_ID)
+			if upvote_emoji is None or downvote_emoji is None:
+				return None
+			self._emojis = (upvote_emoji, downvote_emoji)
+		return self._emojis
+
+	def enqueue(self, channel_id: int, message_id: int) -> None:
+		queue = self.queues.setdefault(channel_id, deque())
+		if len(queue) >= self.queue_limit:
+			queue.popleft()
+			self.shed += 1
+		queue.append((message_id, time.monotonic()))
+		self.queued += 1
+		if channel_id not in self.workers:
+			self.workers[channel_id] = asyncio.create_task(self._work(channel_id, queue))
+
+	async def _work(self, channel_id: int, queue: deque[tuple[int, float]]) -> None:
+		channel = self.bot.get_partial_messageable(channel_id)
+		try:
+			while queue:
+				message_id, queued_at = queue.popleft()
+				if time.monotonic() - queued_at > self.max_age:
+					self.expired += 1
+					continue
+				emojis = self.emojis()
+				if emojis is None:
+					logger.warning("Vote emotes not found, cannot add vote reactions.")
+					self.failed += 1
+					continue
+				message = channel.get_partial_message(message_id)
+				try:
+					for emoji in emojis:
+						await message.add_reaction(emoji)
+						await asyncio.sleep(self.interval)
+				except discord.NotFound:
+					pass
+				except discord.HTTPException as e:
+					logger.warning(f"Failed to add vote reactions to message {message_id}: {e}")
+					self.failed += 1
+				else:
+					self.reacted += 1
+		finally:
+			# Removed without awaiting in between, so a post enqueued afterwards always starts a new worker.
+			self.queues.pop(channel_id, None)
+			self.workers.pop(channel_id, None)
+
+	def pending(self) -> int:
+		return sum(len(queue) for queue in self.queues.values())
+
+	def close(self) -> None:
+		for worker in list(self.workers.values()):
+			worker.cancel()
+
+
+class _KasinoRenderer:
+	"""Renders kasino messages from in-memory kasino rows, which carry the pool and participant counters.
+
+	Bets only schedule a render, so a burst of bets within `delay` seconds results in one message edit
+	showing the latest totals.
+	"""
+
+	def __init__(self, bot: core.Substiify, delay: float) -> None:
+		self.bot = bot
+		self.delay = delay
+		self.kasinos: dict[int, Record] = {}
+		self.scheduled: dict[int, asyncio.Task] = {}
+		self.renders = 0
+		self.coalesced = 0
+
+	async def load(self, kasino_id: int) -> Record | None:
+		kasino = await self.bot.db.pool.fetchrow("SELECT * FROM kasino WHERE id = $1", kasino_id)
+		if kasino is None:
+			self.kasinos.pop(kasino_id, None)
+			return None
+		self.kasinos[kasino_id] = kasino
+		return kasino
+
+	def remember(self, kasino: Record) -> None:
+		"""Keeps the kasino row returned by a bet unless a bet that committed later was already remembered."""
+		known = self.kasinos.get(kasino["id"])
+		if (
+			known is not None
+			and known["option1_pool"] + known["option2_pool"] > kasino["option1_pool"] + kasino["option2_pool"]
+		):
+			return
+		self.kasinos[kasino["id"]] = kasino
+
+	def schedule(self, kasino_id: int) -> None:
+		if kasino_id in self.scheduled:
+			self.coalesced += 1
+			return
+		self.scheduled[kasino_id] = asyncio.create_task(self._render_later(kasino_id))
+
+	async def _render_later(self, kasino_id: int) -> None:
+		await asyncio.sleep(self.delay)
+		self.scheduled.pop(kasino_id, None)
+		try:
+			await self.render(kasino_id)
+		except Exception:
+			logger.exception(f"Failed to update kasino message {kasino_id}")
+
+	async def render(self, kasino_id: int, reload: bool = False) -> discord.PartialMessage | None:
+		kasino = None if reload else self.kasinos.get(kasino_id)
+		if kasino is None:
+			kasino = await self.load(kasino_id)
+			if kasino is None:
+				return None
+		bets_a_amount: int = kasino["option1_pool"]
+		bets_b_amount: int = kasino["option2_pool"]
+		a_odds, b_odds = _calculate_odds(bets_a_amount, bets_b_amount)
+
+		description = "The kasino has been opened! Place your bets! :game_die:"
+		if kasino["locked"]:
+			description = "The kasino is locked! No more bets are taken in. Time to wait and see..."
+		description += f"\n**Participants:** `{kasino['participants']}`"
+
+		title = f":game_die: {kasino['question']}"
+		color = discord.Colour.from_rgb(52, 79, 235)
+		if kasino["locked"]:
+			title = f"[LOCKED] {title}"
+			color = discord.Colour.from_rgb(209, 25, 25)
+
+		embed = discord.Embed(title=title, description=description, color=color)
+		embed.set_footer(text=f"On the table: {bets_a_amount + bets_b_amount} Karma | ID: {kasino_id}")
+		embed.set_thumbnail(url="https://cdn.betterttv.net/emote/602548a4d47a0b2db8d1a3b8/3x.gif")
+		embed.add_field(
+			name=f"**1:** {kasino['option1']}",
+			value=f"**Odds:** 1:{round(a_odds, 3)}\n**Pool:** {bets_a_amount} Karma",
+		)
+		embed.add_field(
+			name=f"**2:** {kasino['option2']}",
+			value=f"**Odds:** 1:{round(b_odds, 3)}\n**Pool:** {bets_b_amount} Karma",
+		)
+
+		channel = self.bot.get_partial_messageable(kasino["discord_channel_id"], guild_id=kasino["discord_server_id"])
+		kasino_msg = channel.get_partial_message(kasino["discord_message_id"])
+		await kasino_msg.edit(embed=embed, view=KasinoView(kasino))
+		self.renders += 1
+		return kasino_msg
+
+	def forget(self, kasino_id: int) -> None:
+		self.kasinos.pop(kasino_id, None)
+		task = self.scheduled.pop(kasino_id, None)
+		if task is not None:
+			task.cancel()
+
+	def close(self) -> None:
+		for kasino_id in list(self.scheduled):
+			self.forget(kasino_id)
+
+
+class _KarmaLedger:
+	"""Writes karma ledger entries with the connection of the transaction that changes the karma.
+
+	Karma and ledger are therefore committed together and can only disagree through real drift.
+	The daily rollups in karma_daily are updated in the same transaction.
+	"""
+
+	def __init__(self) -> None:
+		self.writes = 0
+		self.written = 0
+		self.last_snapshot: datetime | None = None
+		self.last_drift: list[Record] = []
+
+	@staticmethod
+	def entry(
+		user_id: int, server_id: int, amount: int, reason: str, reference_id: int | None = None
+	) -> tuple[int, int, int, str, int | None, datetime]:
+		return (user_id, server_id, amount, reason, reference_id, datetime.utcnow())
+
+	async def write(self, conn: Connection, *entries: tuple[int, int, int, str, int | None, datetime]) -> None:
+		entries = [entry for entry in entries if entry[2]]
+		if not entries:
+			return
+		await conn.execute(LEDGER_WRITE_QUERY, *[list(column) for column in zip(*entries)])
+		self.writes += 1
+		self.written += len(entries)
+
+	async def copy(self, conn: Connection, entries: list[tuple[int, int, int, str, int | None, datetime]]) -> None:
+		"""Writes a large batch of entries with binary COPY."""
+		entries = [entry for entry in entries if entry[2]]
+		if not entries:
+			return
+		await conn.copy_records_to_table("karma_ledger", records=entries, columns=LEDGER_COLUMNS)
+		await conn.execute(KARMA_DAILY_QUERY, *self._daily_rollups(entries))
+		self.writes += 1
+		self.written += len(entries)
+
+	@staticmethod
+	def _daily_rollups(entries: list[tuple[int, int, int, str, int | None, datetime]]) -> list[list]:
+		rollups: dict[tuple[int, int, date], list[int]] = {}
+		for user_id, server_id, amount, _, _, created_at in entries:
+			rollup = rollups.setdefault((server_id, user_id, created_at.date()), [0, 0])
+			if amount > 0:
+				rollup[0] += amount
+			else:
+				rollup[1] -= amount
+		keys = list(rollups)
+		return [
+			[server_id for server_id, _, _ in keys],
+			[user_id for _, user_id, _ in keys],
+			[day for _, _, day in keys],
+			[gained for gained, _ in rollups.values()],
+			[lost for _, lost in rollups.values()],
+		]
 
 
 class Karma(commands.Cog):
 	COG_EMOJI = "☯️"
 
-	def __init__(self, bot: core.Substiify, vote_channels: list[int]):
+	def __init__(self, bot: core.Substiify, vote_channels: set[int]):
 		self.bot = bot
 		self.vote_channels = vote_channels
+		self._karma_emotes: dict[int, tuple[frozenset[int], frozenset[int]]] = {}
+		self._votes = _VoteBuffer()
+		self._votes_flush_lock = asyncio.Lock()
+		self._votes_flush_task: asyncio.Task | None = None
+		self._messages = _MessageIndex(MAX_INDEXED_MESSAGES)
+		self._reaction_locks = _LockStripes(REACTION_LOCK_STRIPES)
+		self._message_authors = _MessageAuthors(MAX_INDEXED_AUTHORS)
+		self._prewarm_task: asyncio.Task | None = None
+		self._kasino_migration_task: asyncio.Task | None = None
+		self._auto_reactor = _AutoReactor(bot, AUTO_REACTION_INTERVAL, AUTO_REACTION_QUEUE_LIMIT, AUTO_REACTION_MAX_AGE)
+		self._debounce_window = float(core.config.KARMA_VOTE_DEBOUNCE_SECONDS)
+		self._debounced_reactions: dict[
+			tuple[int, int, int], tuple[bool, discord.RawReactionActionEvent, asyncio.Task]
+		] = {}
+		self._suppressed_reactions = 0
+		self._rankings: dict[int, utils.RankedIndex] = {}
+		self._stats_cache: dict[int, tuple[float, Record]] = {}
+		self._kasino_renderer = _KasinoRenderer(bot, KASINO_RENDER_DELAY)
+		self._ledger = _KarmaLedger()
+		self._reconciliations: dict[int, asyncio.Task] = {}
+
+	async def cog_load(self) -> None:
+		records = await self.bot.db.pool.fetch(
+			"SELECT discord_server_id, discord_emote_id, increase_karma FROM karma_emote"
+		)
+		self._karma_emotes = _group_karma_emotes(records)
+		logger.info(f"Cached karma emotes for {len(self._karma_emotes)} servers")
+
+		karma_records = await self.bot.db.pool.fetch("SELECT discord_server_id, discord_user_id, amount FROM karma")
+		for record in karma_records:
+			self._get_ranking(record["discord_server_id"]).set(record["discord_user_id"], record["amount"] or 0)
+		logger.info(f"Ranked karma of {len(karma_records)} users in {len(self._rankings)} servers")
+
+		await self.reconcile_kasinos()
+		self.bot.add_dynamic_items(KasinoBetButton, KasinoLockButton)
+		await self._rehydrate_kasinos()
+		self._kasino_migration_task = asyncio.create_task(self._migrate_kasino_buttons())
+		self.flush_votes.start()
+		self.snapshot_karma.start()
+
+		unfinished = await self.bot.db.pool.fetch(
+			"SELECT discord_server_id FROM post_reconciliation WHERE finished_at IS NULL"
+		)
+		for record in unfinished:
+			self._start_reconciliation(record["discord_server_id"])
+
+		self._prewarm_task = asyncio.create_task(self._prewarm_message_authors())
+
+	async def cog_unload(self) -> None:
+		self.bot.remove_dynamic_items(KasinoBetButton, KasinoLockButton)
+		self.flush_votes.cancel()
+		self._kasino_renderer.close()
+		self.snapshot_karma.cancel()
+		for task in self._reconciliations.values():
+			task.cancel()
+		if self._prewarm_task is not None:
+			self._prewarm_task.cancel()
+		if self._kasino_migration_task is not None:
+			self._kasino_migration_task.cancel()
+		self._auto_reactor.close()
+		await self._release_debounced_reactions()
+		await self._flush_votes()
+
+	async def _prewarm_message_authors(self) -> None:
+		"""Indexes the authors of recent vote channel posts, so reactions on them need no message fetch."""
+		await self.bot.wait_until_ready()
+		for channel_id in self.vote_channels:
+			channel = self.bot.get_channel(channel_id)
+			# Forum and category channels have no message history of their own.
+			if not isinstance(channel, discord.abc.Messageable):
+				continue
+			try:
+				messages = [message async for message in channel.history(limit=AUTHOR_PREWARM_LIMIT)]
+			except discord.HTTPException as e:
+				logger.warning(f"Failed to read history of vote channel {channel_id}: {e}")
+				continue
+			# History is newest first, adding it in reverse keeps the arrival order the eviction relies on.
+			for message in reversed(messages):
+				if not message.author.bot:
+					self._message_authors.add(message.id, message.author.id)
+		logger.info(f"Indexed the authors of {len(self._message_authors)} vote channel posts")
+
+	@tasks.loop(seconds=VOTE_FLUSH_INTERVAL)
+	async def flush_votes(self) -> None:
+		# Shielded so cancelling the loop on unload never drops a batch that was already drained.
+		await asyncio.shield(self._flush_votes())
+
+	async def _flush_votes(self) -> None:
+		async with self._votes_flush_lock:
+			await self._flush_votes_locked()
+
+	async def _flush_votes_locked(self) -> bool:
+		"""Writes the buffered votes, the caller holds the flush lock. Returns whether nothing is left buffered."""
+		batch = self._votes.drain()
+		if not batch.events:
+			return True
+
+		started = time.perf_counter()
+		entries = [
+			_KarmaLedger.entry(votes.user_id, votes.server_id, votes.upvotes - votes.downvotes, "vote", message_id)
+			for message_id, votes in batch.posts.items()
+		]
+		try:
+			async with self.bot.db.pool.acquire() as conn, conn.transaction():
+				rows = await conn.fetchval(FLUSH_VOTES_QUERY, *batch.query_args())
+				await self._ledger.copy(conn, entries)
+		except Exception:
+			self._votes.failed_attempts += 1
+			self._votes.restore(batch)
+			if self._votes.exceeds(VOTE_BUFFER_MAX_EVENTS, VOTE_BUFFER_MAX_AGE):
+				dropped = self._votes.drain()
+				self._votes.dropped_events += dropped.events
+				logger.exception(f"Dropping {dropped.events} buffered karma votes, flushes kept failing past the cap.")
+			else:
+				logger.exception(f"Failed to flush {batch.events} buffered karma votes, retrying.")
+			return False
+
+		self._votes.failed_attempts = 0
+		self._votes.record_flush(batch.events, rows, time.perf_counter() - started)
+		for (user_id, server_id), amount in batch.karma.items():
+			self._get_ranking(server_id).add(user_id, amount)
+		return True
+
+	@tasks.loop(hours=KARMA_SNAPSHOT_INTERVAL_HOURS)
+	async def snapshot_karma(self) -> None:
+		try:
+			await self._snapshot_karma()
+		except Exception:
+			logger.exception("Failed to snapshot karma from the ledger")
+
+	async def _snapshot_karma(self, repair: bool = False) -> list[Record]:
+		"""Advances the karma snapshot to the end of the ledger and returns the balances that drifted from it.
+
+		With `repair`, drifted karma rows are reset to their ledger balance.
+		"""
+		await self._flush_votes()
+		# Every karma change writes its ledger entries in the same transaction. The ledger is only locked to fix a
+		# watermark no later commit can fall below, the aggregation runs without the lock. Karma and the newer
+		# ledger entries are compared in one snapshot, and a repair of a balance that changed since then fails
+		# with a serialization error instead of reverting the change.
+		async with self.bot.db.pool.acquire() as conn:
+			async with conn.transaction():
+				await conn.execute(KARMA_SNAPSHOT_LOCK_QUERY)
+				watermark = await conn.fetchval(KARMA_WATERMARK_QUERY)
+			async with conn.transaction(isolation="repeatable_read"):
+				drift = await conn.fetch(KARMA_SNAPSHOT_QUERY, watermark)
+				repaired = []
+				if repair and drift:
+					repaired = await conn.fetch(
+						KARMA_REPAIR_QUERY,
+						[row["discord_user_id"] for row in drift],
+						[row["discord_server_id"] for row in drift],
+						[row["expected"] for row in drift],
+					)
+
+		for record in repaired:
+			self._get_ranking(record["discord_server_id"]).set(record["discord_user_id"], record["amount"])
+		self._ledger.last_snapshot = datetime.utcnow()
+		self._ledger.last_drift = drift
+		if drift:
+			logger.warning(f"Karma of {len(drift)} users drifted from the ledger ({len(repaired)} repaired)")
+		return drift
+
+	def _schedule_votes_flush(self) -> None:
+		if self._votes_flush_task is None or self._votes_flush_task.done():
+			self._votes_flush_task = asyncio.create_task(self._flush_votes())
 
 	@commands.Cog.listener()
 	async def on_message(self, message: discord.Message):
+		if message.guild is not None:
+			self._messages.add(message)
 		if message.author.bot:
 			return
 		if message.type == discord.MessageType.thread_created:
 			return
 		if message.channel.id in self.vote_channels:
-			try:
-				upvote_emoji = self.bot.get_emoji(core.constants.UPVOTE_EMOTE_ID)
-				downvote_emoji = self.bot.get_emoji(core.constants.DOWNVOTE_EMOTE_ID)
+			self._message_authors.add(message.id, message.author.id)
+			self._auto_reactor.enqueue(message.channel.id, message.id)
 
-				await message.add_reaction(upvote_emoji)
-				await message.add_reaction(downvote_emoji)
-			except discord.NotFound:
-				pass
+	@commands.Cog.listener()
+	async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+		self._messages.discard(payload.message_id)
+		self._message_authors.discard(payload.message_id)
+
+	@commands.Cog.listener()
+	async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+		for message_id in payload.message_ids:
+			self._messages.discard(message_id)
+			self._message_authors.discard(message_id)
 
 	@commands.Cog.listener()
 	async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
@@ -59,22 +1037,65 @@ class Karma(commands.Cog):
 		if payload.emoji.id is None:
 			return
 
-		upvote_emotes = await self._get_karma_upvote_emotes(payload.guild_id)
-		downvote_emotes = await self._get_karma_downvote_emotes(payload.guild_id)
+		upvote_emotes, downvote_emotes = self._get_karma_emotes(payload.guild_id)
+		if payload.emoji.id not in upvote_emotes and payload.emoji.id not in downvote_emotes:
+			return
 
-		if payload.emoji.id not in [*upvote_emotes, *downvote_emotes]:
+		if self._debounce_window <= 0:
+			await self._persist_reaction(payload, add_reaction)
 			return
 
-		post = await self._get_post_from_db(payload.message_id)
-		message = None
-		if post is None:
+		key = (payload.message_id, payload.user_id, payload.emoji.id)
+		pending = self._debounced_reactions.pop(key, None)
+		if pending is not None:
+			pending_add_reaction, pending_payload, pending_task = pending
+			pending_task.cancel()
+			if pending_add_reaction != add_reaction:
+				# An add and a remove of the same emote cancel out, neither needs to be persisted.
+				self._suppressed_reactions += 2
+				return
+			await self._persist_reaction(pending_payload, pending_add_reaction)
+
+		task = asyncio.create_task(self._persist_reaction_later(key, payload, add_reaction))
+		self._debounced_reactions[key] = (add_reaction, payload, task)
+
+	async def _persist_reaction_later(
+		self, key: tuple[int, int, int], payload: discord.RawReactionActionEvent, add_reaction: bool
+	) -> None:
+		await asyncio.sleep(self._debounce_window)
+		self._debounced_reactions.pop(key, None)
+		try:
+			await self._persist_reaction(payload, add_reaction)
+		except Exception:
+			logger.exception(f"Failed to process karma reaction on message {payload.message_id}.")
+
+	async def _release_debounced_reactions(self) -> None:
+		pending_reactions = list(self._debounced_reactions.values())
+		self._debounced_reactions.clear()
+		for add_reaction, payload, task in pending_reactions:
+			task.cancel()
+			await self._persist_reaction(payload, add_reaction)
+
+	async def _persist_reaction(self, payload: discord.RawReactionActionEvent, add_reaction: bool) -> None:
+		# Reactions on the same message are persisted one after another, so only the first one looks up
+		# the post author and the others find it in the vote buffer.
+		async with self._reaction_locks.hold(payload.message_id):
+			await self._persist_locked_reaction(payload, add_reaction)
+
+	async def _persist_locked_reaction(self, payload: discord.RawReactionActionEvent, add_reaction: bool) -> None:
+		upvote_emotes, _ = self._get_karma_emotes(payload.guild_id)
+		post_author_id = self._votes.get_post_author(payload.message_id)
+		post = None if post_author_id is not None else await self._get_post_from_db(payload.message_id)
+		author = None
+		created_at = None
+		if post_author_id is not None:
+			user_id = post_author_id
+		elif post is None:
 			result = await self.check_payload(payload)
 			if result is None:
 				return
-			user, message = result
-
-			await self.bot.db.pool.execute(dbc.USER_INSERT_QUERY, user.id, user.display_name, user.display_avatar.url)
-			user_id = user.id
+			author, created_at = result
+			user_id = author.id
 		else:
 			user_id = post["discord_user_id"]
 
@@ -93,9 +1114,6 @@ class Karma(commands.Cog):
 			logger.warning(f"Failed to fetch guild/channel for karma reaction: {e}")
 			return
 
-		await self.bot.db._insert_server(server)
-		await self.bot.db._insert_server_channel(channel)
-
 		is_upvote = payload.emoji.id in upvote_emotes
 
 		karma_amount = 1  # Assume positive karma
@@ -107,70 +1125,42 @@ class Karma(commands.Cog):
 			karma_amount *= -1
 			(upvote, downvote) = (downvote, upvote)
 
-		await self._upsert_karma(payload, user_id, karma_amount)
-		await self._upsert_post_votes(payload, user_id, upvote, downvote, message=message)
+		votes = _PendingPostVotes(user_id, payload.guild_id, payload.channel_id, created_at, upvote, downvote)
+		self._votes.add(payload.message_id, votes, karma_amount, server, channel, author=author)
+		# While flushes fail the periodic loop retries, so a growing buffer does not trigger a flush per reaction.
+		if len(self._votes) >= VOTE_FLUSH_MAX_EVENTS and not self._votes.failed_attempts:
+			self._schedule_votes_flush()
 
 	async def _get_post_from_db(self, message_id: int) -> Record:
 		stmt = "SELECT * FROM post WHERE discord_message_id = $1"
 		return await self.bot.db.pool.fetchrow(stmt, message_id)
 
-	async def _upsert_karma(self, payload: discord.RawReactionActionEvent, user_id: int, amount: int):
-		await self.bot.db.pool.execute(UPSERT_KARMA_QUERY, user_id, payload.guild_id, amount)
-
-	async def _upsert_post_votes(
-		self,
-		payload: discord.RawReactionActionEvent,
-		user_id: int,
-		upvote: int,
-		downvote: int,
-		message: discord.Message | None = None,
-	):
-		if message is None:
-			await self.bot.db.pool.execute(
-				"UPDATE post SET upvotes = post.upvotes + $1, downvotes = post.downvotes + $2 WHERE discord_message_id = $3",
-				upvote,
-				downvote,
-				payload.message_id,
-			)
-			return
-
-		await self.bot.db.pool.execute(
-			UPSERT_POST_VOTES_QUERY,
-			user_id,
-			payload.guild_id,
-			payload.channel_id,
-			payload.message_id,
-			message.created_at.replace(tzinfo=None),
-			upvote,
-			downvote,
-		)
-
-	async def check_payload(
-		self, payload: discord.RawReactionActionEvent
-	) -> tuple[discord.Member, discord.Message] | None:
+	async def check_payload(self, payload: discord.RawReactionActionEvent) -> tuple[discord.abc.User, datetime] | None:
+		"""Returns the author and creation time of a post that is not stored yet, or None if it gets no karma."""
 		if payload.event_type == "REACTION_ADD" and payload.member.bot:
 			return None
-		message = await self.__get_message_from_payload(payload)
-		if message is None:
-			return None
-		if message.author.bot:
+		author = await self.__get_author_from_payload(payload)
+		if author is None or author.bot:
 			return None
-		reaction_user = payload.member or self.bot.get_user(payload.user_id)
-		if not reaction_user:
-			logger.warning(f"User {payload.user_id} not found in cache for karma reaction. Fetching from API.")
-			try:
-				reaction_user = await self.bot.fetch_user(payload.user_id)
-			except Exception as e:
-				logger.warning(f"Failed to fetch user {payload.user_id} for karma reaction: {e}")
-				return None
-		if reaction_user == message.author:
+		if payload.user_id == author.id:
 			return None
-		return message.author, message
+		return author, discord.utils.snowflake_time(payload.message_id).replace(tzinfo=None)
 
-	async def __get_message_from_payload(self, payload: discord.RawReactionActionEvent) -> discord.Message | None:
-		cached_message = discord.utils.get(self.bot.cached_messages, id=payload.message_id)
+	async def __get_author_from_payload(self, payload: discord.RawReactionActionEvent) -> discord.abc.User | None:
+		cached_message = self._messages.get(payload.message_id)
 		if cached_message is not None:
-			return cached_message
+			return cached_message.author
+		author_id = self._message_authors.get(payload.message_id)
+		if author_id is not None:
+			guild = self.bot.get_guild(payload.guild_id)
+			author = (guild and guild.get_member(author_id)) or self.bot.get_user(author_id)
+			if author is not None:
+				return author
+		self._message_authors.fetches += 1
+		message = await self.__fetch_message_from_payload(payload)
+		return message.author if message is not None else None
+
+	async def __fetch_message_from_payload(self, payload: discord.RawReactionActionEvent) -> discord.Message | None:
 		channel = self.bot.get_channel(payload.channel_id)
 		if channel is None:
 			logger.debug(f"Channel {payload.channel_id} not in cache, cannot fetch message for karma reaction.")
@@ -193,12 +1183,37 @@ class Karma(commands.Cog):
 		stmt = "SELECT * FROM karma_emote WHERE discord_server_id = $1 AND discord_emote_id = $2"
 		return await self.bot.db.pool.fetchrow(stmt, server_id, emote.id)
 
-	async def _get_karma_upvote_emotes(self, guild_id: int) -> list[int]:
-		stmt_upvotes = "SELECT discord_emote_id FROM karma_emote WHERE discord_server_id = $1 AND increase_karma = True"
-		emote_records = await self.bot.db.pool.fetch(stmt_upvotes, guild_id)
-		server_upvote_emotes = [emote["discord_emote_id"] for emote in emote_records]
-		server_upvote_emotes.append(int(core.constants.UPVOTE_EMOTE_ID))
-		return server_upvote_emotes
+	async def set_karma(self, guild_id: int, balances: dict[int, int], reason: str) -> None:
+		"""Overwrites the karma of users and writes the differences to the ledger in the same transaction."""
+		async with self.bot.db.pool.acquire() as conn, conn.transaction():
+			results = await conn.fetch(SET_KARMA_QUERY, guild_id, list(balances), list(balances.values()))
+			await self._ledger.write(
+				conn,
+				*[
+					_KarmaLedger.entry(result["discord_user_id"], guild_id, result["difference"], reason)
+					for result in results
+				],
+			)
+		ranking = self._get_ranking(guild_id)
+		for result in results:
+			ranking.set(result["discord_user_id"], result["amount"])
+
+	def _get_ranking(self, guild_id: int) -> utils.RankedIndex:
+		ranking = self._rankings.get(guild_id)
+		if ranking is None:
+			ranking = self._rankings[guild_id] = utils.RankedIndex()
+		return ranking
+
+	def _get_karma_emotes(self, guild_id: int) -> tuple[frozenset[int], frozenset[int]]:
+		return self._karma_emotes.get(guild_id, DEFAULT_KARMA_EMOTES)
+
+	async def _refresh_karma_emotes(self, guild_id: int) -> None:
+		stmt = (
+			"SELECT discord_server_id, discord_emote_id, increase_karma FROM karma_emote WHERE discord_server_id = $1"
+		)
+		records = await self.bot.db.pool.fetch(stmt, guild_id)
+		self._karma_emotes.pop(guild_id, None)
+		self._karma_emotes.update(_group_karma_emotes(records))
 
 	@commands.hybrid_group(invoke_without_command=True)
 	async def votes(self, ctx: commands.Context):
@@ -241,8 +1256,7 @@ class Karma(commands.Cog):
 		If users click the reactions, user karma will be updated.
 		"""
 		channel = channel or ctx.channel
-		if channel.id not in self.vote_channels:
-			self.vote_channels.append(channel.id)
+		self.vote_channels.add(channel.id)
 		stmt = "SELECT * FROM discord_channel WHERE discord_channel_id = $1 AND upvote = True"
 		votes_enabled = await self.bot.db.pool.fetch(stmt, channel.id)
 		logger.info(f"Votes enabled: {votes_enabled}")
@@ -271,8 +1285,7 @@ class Karma(commands.Cog):
                   VALUES ($1, $2, $3, $4, $5) ON CONFLICT (discord_channel_id) DO UPDATE SET upvote = $5"""
 		await self.bot.db.pool.execute(stmt, channel.id, channel.name, channel.guild.id, None, False)
 
-		if channel.id in self.vote_channels:
-			self.vote_channels.remove(channel.id)
+		self.vote_channels.discard(channel.id)
 
 		embed = discord.Embed(
 			description=f"Votes has been stopped in {channel.mention}!",
@@ -365,26 +1378,36 @@ class Karma(commands.Cog):
 			embed.description = f"`{user}` is not a member of this server!"
 			return await ctx.send(embed=embed)
 
-		donator_karma = await self._get_user_karma(ctx.author.id, ctx.guild.id)
-		if donator_karma is None:
-			embed.description = "You don't have any karma!"
+		if user == ctx.author:
+			embed.description = "You can't donate karma to yourself!"
 			return await ctx.send(embed=embed)
 
-		if donator_karma < amount:
-			embed.description = "You don't have enough karma!"
+		async with self.bot.db.pool.acquire() as conn, conn.transaction():
+			transfer = await conn.fetchrow(
+				DONATE_KARMA_QUERY,
+				ctx.author.id,
+				user.id,
+				ctx.guild.id,
+				user.name,
+				user.display_avatar.url,
+				amount,
+			)
+			if transfer["donator_balance"] is not None:
+				await self._ledger.write(
+					conn,
+					_KarmaLedger.entry(ctx.author.id, ctx.guild.id, -amount, "donate", user.id),
+					_KarmaLedger.entry(user.id, ctx.guild.id, amount, "donate", ctx.author.id),
+				)
+		if transfer["donator_balance"] is None:
+			if transfer["previous_balance"] is None:
+				embed.description = "You don't have any karma!"
+			else:
+				embed.description = "You don't have enough karma!"
 			return await ctx.send(embed=embed)
 
-		await self.bot.db.pool.execute(dbc.USER_INSERT_QUERY, user.id, user.display_name, user.display_avatar.url)
-		await self.bot.db.pool.execute(
-			dbc.USER_INSERT_QUERY,
-			ctx.author.id,
-			ctx.author.display_name,
-			ctx.author.display_avatar.url,
-		)
-
-		await self.bot.db.pool.executemany(
-			UPSERT_KARMA_QUERY, [(user.id, ctx.guild.id, amount), (ctx.author.id, ctx.guild.id, -amount)]
-		)
+		ranking = self._get_ranking(ctx.guild.id)
+		ranking.set(ctx.author.id, transfer["donator_balance"])
+		ranking.set(user.id, transfer["receiver_balance"])
 
 		embed = discord.Embed(color=discord.Colour.green())
 		embed.description = f"{ctx.author.mention} has donated {amount} karma to {user.mention}!"
@@ -483,6 +1506,7 @@ class Karma(commands.Cog):
 			"INSERT INTO karma_emote (discord_server_id, discord_emote_id, increase_karma) VALUES ($1, $2, $3)"
 		)
 		await self.bot.db.pool.execute(stmt_insert_emote, ctx.guild.id, emote.id, not bool(emote_action))
+		await self._refresh_karma_emotes(ctx.guild.id)
 
 		embed = discord.Embed(title=f"Emote {emote} added to the list.")
 		await ctx.send(embed=embed)
@@ -503,6 +1527,7 @@ class Karma(commands.Cog):
 
 		stmt_delete_emote = "DELETE FROM karma_emote WHERE discord_server_id = $1 AND discord_emote_id = $2"
 		await self.bot.db.pool.execute(stmt_delete_emote, ctx.guild.id, emote.id)
+		await self._refresh_karma_emotes(ctx.guild.id)
 
 		embed = discord.Embed(title=f"Emote {emote} removed from the list.")
 		await ctx.send(embed=embed)
@@ -513,35 +1538,104 @@ class Karma(commands.Cog):
 	@karma.command(name="leaderboard", aliases=["lb", "leaderbord"], usage="leaderboard")
 	async def karma_leaderboard(self, ctx: commands.Context, global_leaderboard: str = None):
 		"""
-		Shows users with the most karma on the server.
+		Shows users with the most karma on the server. Use the buttons to page through the whole leaderboard.
+		Use `global` to show the users with the most karma across all servers.
 		"""
 		async with ctx.typing():
-			embed = discord.Embed(title="Karma Leaderboard")
-
-			if global_leaderboard is None:
-				stmt_karma_leaderboard = "SELECT discord_user_id, amount FROM karma WHERE discord_server_id = $1 ORDER BY amount DESC LIMIT 15"
-				results = await self.bot.db.pool.fetch(stmt_karma_leaderboard, ctx.guild.id)
-
-			elif global_leaderboard == "global":
+			if global_leaderboard == "global":
 				stmt_karma_leaderboard = "SELECT discord_user_id, amount FROM karma ORDER BY amount DESC LIMIT 15"
 				results = await self.bot.db.pool.fetch(stmt_karma_leaderboard)
+				entries = [(entry["discord_user_id"], entry["amount"]) for entry in results]
+				embed = await self._create_karma_leaderboard_embed(entries, start=1)
+				return await ctx.send(embed=embed)
 
-			if not results:
-				embed.description = "No users have karma."
+			ranking = self._get_ranking(ctx.guild.id)
+			view = KarmaLeaderboardView(self, ctx.author.id, ranking)
+			embed = await view.create_embed()
+			if view.page_count == 1:
 				return await ctx.send(embed=embed)
+			view.message = await ctx.send(embed=embed, view=view)
 
-			async def get_user(user_id: int) -> discord.User:
-				return self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+	async def _create_karma_leaderboard_embed(self, entries: list[tuple[int, int]], start: int) -> discord.Embed:
+		embed = discord.Embed(title="Karma Leaderboard")
+		if not entries:
+			embed.description = "No users have karma."
+			return embed
 
-			users = await asyncio.gather(*[get_user(entry["discord_user_id"]) for entry in results])
+		users = await self.bot.user_resolver.resolve_many(user_id for user_id, _ in entries)
 
-			lines = [
-				f"`{str(i).rjust(2)}.` | `{entry['amount']}` - {user.mention}"
-				for i, (entry, user) in enumerate(zip(results, users), start=1)
-			]
+		lines = [
+			f"`{str(i).rjust(2)}.` | `{amount}` - {f'<@{user_id}>' if user_id in users else 'Unknown user'}"
+			for i, (user_id, amount) in enumerate(entries, start=start)
+		]
 
-			embed.description = "\n".join(lines)
-			await ctx.send(embed=embed)
+		embed.description = "\n".join(lines)
+		return embed
+
+	@karma.command(name="rank", usage="rank [user]")
+	async def karma_rank(self, ctx: commands.Context, user: discord.User = None):
+		"""
+		Shows the position of a user on the karma leaderboard of the server.
+		If you dont specify a user, it will show your own position.
+		"""
+		user = user or ctx.author
+		ranking = self._get_ranking(ctx.guild.id)
+		position = ranking.rank(user.id)
+		if position is None:
+			embed = discord.Embed(
+				description=f"{user.mention} is not on the karma leaderboard yet.", color=discord.Colour.red()
+			)
+			return await ctx.send(embed=embed)
+
+		embed = discord.Embed(
+			title=f"Karma Rank - {ctx.guild.name}",
+			description=f"{user.mention} is ranked **#{position}** of {len(ranking)} with {ranking.get(user.id)} karma.",
+		)
+		await ctx.send(embed=embed)
+
+	@commands.cooldown(1, 10, commands.BucketType.user)
+	@karma.command(name="trend", usage="trend [user] [days]")
+	async def karma_trend(
+		self, ctx: commands.Context, user: Optional[discord.User] = None, days: int = KARMA_TREND_DEFAULT_DAYS
+	):
+		"""
+		Shows how the karma of a user changed per day over the last days (30 by default, up to 365).
+		If you dont specify a user, it will show your own karma.
+		"""
+		user = user or ctx.author
+		days = max(1, min(days, KARMA_TREND_MAX_DAYS))
+		await self._flush_votes()
+		# Ledger days are UTC dates, so the window starts on a UTC date as well instead of the database's today.
+		start_day = datetime.utcnow().date() - timedelta(days=days - 1)
+		rollups = await self.bot.db.pool.fetch(KARMA_TREND_QUERY, ctx.guild.id, user.id, start_day)
+
+		embed = discord.Embed(title=f"Karma Trend - {user.display_name}", color=core.constants.PRIMARY_COLOR)
+		if not rollups:
+			embed.description = f"{user.mention} had no karma changes in the last {days} days."
+			return await ctx.send(embed=embed)
+
+		# Balances are derived backwards from the current karma, so they stay correct for karma older than the window.
+		balance = self._get_ranking(ctx.guild.id).get(user.id) or 0
+		balances = []
+		for rollup in reversed(rollups):
+			balances.append(balance)
+			balance -= rollup["gained"] - rollup["lost"]
+		balances.reverse()
+
+		gained = sum(rollup["gained"] for rollup in rollups)
+		lost = sum(rollup["lost"] for rollup in rollups)
+		embed.description = (
+			f"{user.mention} since {start_day:%d.%m.%Y}: `+{gained}` / `-{lost}` "
+			f"(net `{gained - lost:+}`, {len(rollups)} active days)"
+		)
+		lines = ["Day         Change   Balance"] + [
+			f"{rollup['day']:%d.%m.%Y} {rollup['gained'] - rollup['lost']:>+7} {day_balance:>9}"
+			for rollup, day_balance in zip(rollups[-KARMA_TREND_ROWS:], balances[-KARMA_TREND_ROWS:])
+		]
+		embed.add_field(name="Daily Karma", value="```" + "\n".join(lines) + "```", inline=False)
+		if len(rollups) > KARMA_TREND_ROWS:
+			embed.set_footer(text=f"Showing the last {KARMA_TREND_ROWS} active days")
+		await ctx.send(embed=embed)
 
 	@commands.cooldown(1, 15, commands.BucketType.user)
 	@karma.command(name="stats", usage="stats")
@@ -553,11 +1647,9 @@ class Karma(commands.Cog):
 		async with ctx.typing():
 			embed = discord.Embed(title="Karma Stats")
 
-			karma_info = await self.bot.db.pool.fetchrow(
-				"SELECT SUM(amount), COUNT(*) FROM karma WHERE discord_server_id = $1", ctx.guild.id
-			)
-			total_karma = karma_info["sum"]
-			karma_users = karma_info["count"]
+			karma_info = await self._get_karma_stats(ctx.guild.id)
+			total_karma = karma_info["total_karma"]
+			karma_users = karma_info["karma_users"]
 
 			if total_karma is None:
 				embed.description = "No users have karma."
@@ -569,41 +1661,94 @@ class Karma(commands.Cog):
 			)
 			embed.add_field(name="Average Karma per user", value=f"`{avg_karma:.2f}`", inline=False)
 
-			# Top percentile calculation
-			stmt_top_percentile = """
-                SELECT amount
-                FROM karma
-                WHERE discord_server_id = $1
-                ORDER BY amount DESC
-                LIMIT (SELECT CEIL($2 * CAST(COUNT(*) AS float)) FROM karma)"""
-
-			percentiles = [(0.1, "10"), (0.01, "1")]
-			for percentile, label in percentiles:
-				top_percentile = await self.bot.db.pool.fetch(stmt_top_percentile, ctx.guild.id, percentile)
-				top_percentile = sum(entry["amount"] for entry in top_percentile)
-				percantege = (top_percentile / total_karma) * 100
+			percentiles = [("top_10_karma", "10"), ("top_1_karma", "1")]
+			for column, label in percentiles:
+				top_percentile = karma_info[column]
+				percantege = (top_percentile / total_karma) * 100 if total_karma else 0
 				embed.add_field(
 					name=f"Top {label}% users karma",
 					value=f"`{top_percentile:n} ({percantege:.2f}% of total)`",
 					inline=False,
 				)
 
-			stmt_avg_upvote_ratio = """
-                SELECT AVG(upvotes / downvotes) as average, COUNT(*) as post_count
-                FROM post
-                WHERE discord_server_id = $1
-                    AND upvotes >= 1
-                    AND downvotes >= 1"""
-
-			avg_post_query = await self.bot.db.pool.fetchrow(stmt_avg_upvote_ratio, ctx.guild.id)
-			avg_ratio = avg_post_query["average"] or 0
-			post_count = avg_post_query["post_count"] or 0
+			avg_ratio = karma_info["avg_ratio"] or 0
+			post_count = karma_info["post_count"] or 0
 			embed.add_field(
 				name="Average upvote ratio per post", value=f"`{avg_ratio:.1f} ({post_count} posts)`", inline=False
 			)
 
 			await ctx.send(embed=embed)
 
+	async def _get_karma_stats(self, guild_id: int) -> Record:
+		cached = self._stats_cache.get(guild_id)
+		if cached is not None and time.monotonic() - cached[0] < KARMA_STATS_CACHE_SECONDS:
+			return cached[1]
+		karma_info = await self.bot.db.pool.fetchrow(KARMA_STATS_QUERY, guild_id)
+		self._stats_cache[guild_id] = (time.monotonic(), karma_info)
+		return karma_info
+
+	@commands.is_owner()
+	@karma.command(name="metrics", hidden=True)
+	async def karma_metrics(self, ctx: commands.Context):
+		"""
+		Shows internal counters of the karma reaction pipeline.
+		"""
+		votes = self._votes
+		avg_flush_ms = votes.total_flush_seconds / max(votes.flushes, 1) * 1000
+		embed = discord.Embed(title="Karma Metrics", color=core.constants.PRIMARY_COLOR)
+		embed.add_field(
+			name="Vote buffer",
+			value=f"`{len(votes)} pending | {votes.flushes} flushes | {votes.flushed_events} events | {votes.flushed_rows} rows | {votes.dropped_events} dropped`",
+			inline=False,
+		)
+		embed.add_field(
+			name="Vote flush latency",
+			value=f"`last size {votes.last_flush_size} | avg {avg_flush_ms:.1f}ms | max {votes.max_flush_seconds * 1000:.1f}ms`",
+			inline=False,
+		)
+		embed.add_field(
+			name="Vote debounce",
+			value=f"`{self._debounce_window}s window | {len(self._debounced_reactions)} pending | {self._suppressed_reactions} suppressed`",
+			inline=False,
+		)
+		locks = self._reaction_locks
+		avg_wait_ms = locks.total_wait_seconds / max(locks.contended, 1) * 1000
+		embed.add_field(
+			name="Reaction locks",
+			value=f"`{len(locks.locks)} stripes | {locks.acquisitions} acquired | {locks.contended} contended ({locks.contention_ratio():.1%}) | avg wait {avg_wait_ms:.1f}ms | max {locks.max_wait_seconds * 1000:.1f}ms`",
+			inline=False,
+		)
+		embed.add_field(
+			name="Message index",
+			value=f"`{len(self._messages)}/{self._messages.limit} messages | {self._messages.hits} hits | {self._messages.misses} misses | {self._messages.hit_ratio():.1%} hit ratio`",
+			inline=False,
+		)
+		authors = self._message_authors
+		embed.add_field(
+			name="Author index",
+			value=f"`{len(authors)}/{authors.limit} posts | {authors.hits} hits | {authors.misses} misses | {authors.fetches} message fetches`",
+			inline=False,
+		)
+		reactor = self._auto_reactor
+		embed.add_field(
+			name="Auto reactions",
+			value=f"`{reactor.pending()} queued in {len(reactor.workers)} channels | {reactor.reacted} reacted | {reactor.shed} shed | {reactor.expired} expired | {reactor.failed} failed`",
+			inline=False,
+		)
+		embed.add_field(
+			name="Kasino renders",
+			value=f"`{self._kasino_renderer.renders} edits | {self._kasino_renderer.coalesced} coalesced | {len(self._kasino_renderer.scheduled)} scheduled`",
+			inline=False,
+		)
+		ledger = self._ledger
+		last_snapshot = ledger.last_snapshot.strftime("%d.%m.%Y %H:%M") if ledger.last_snapshot else "never"
+		embed.add_field(
+			name="Karma ledger",
+			value=f"`{ledger.written} written in {ledger.writes} writes | snapshot {last_snapshot} with {len(ledger.last_drift)} drifted`",
+			inline=False,
+		)
+		await ctx.send(embed=embed)
+
 	@commands.hybrid_group(name="post", aliases=["po"], invoke_without_command=True)
 	async def post(self, ctx: commands.Context):
 		await ctx.send_help(ctx.command)
@@ -615,26 +1760,235 @@ class Karma(commands.Cog):
 		Posts the leaderboard of the most upvoted posts.
 		"""
 		async with ctx.typing():
-			all_board = await self.fetch_and_create_leaderboard(ctx, user)
-			month_board = await self.fetch_and_create_leaderboard(ctx, user, "30 days")
-			week_board = await self.fetch_and_create_leaderboard(ctx, user, "7 days")
-
-		embed = discord.Embed(title="Top Messages")
-		embed.set_thumbnail(url=ctx.guild.icon)
-		embed.add_field(name="Top 5 All Time", value=all_board, inline=False)
-		embed.add_field(name="Top 5 This Month", value=month_board, inline=False)
-		embed.add_field(name="Top 5 This Week", value=week_board, inline=False)
+			user_id = user.id if user else None
+			posts = await self.bot.db.pool.fetch(POST_LEADERBOARD_QUERY, ctx.guild.id, user_id)
+			boards: dict[int, list[Record]] = {board: [] for board in POST_LEADERBOARD_WINDOWS}
+			for post in posts:
+				boards[post["board"]].append(post)
+
+			embed = discord.Embed(title="Top Messages")
+			embed.set_thumbnail(url=ctx.guild.icon)
+			users = await self.bot.user_resolver.resolve_many(post["discord_user_id"] for post in posts)
+			for board, name in POST_LEADERBOARD_WINDOWS.items():
+				embed.add_field(name=name, value=self._create_post_leaderboard(boards[board], users), inline=False)
 		await ctx.send(embed=embed)
 
-	async def fetch_and_create_leaderboard(self, ctx: commands.Context, user: discord.User, interval: str = None):
-		user_query = " AND discord_user_id = $2" if user else ""
-		interval_query = f" AND created_at > NOW() - INTERVAL '{interval}'" if interval else ""
-		stmt = (
-			f"SELECT * FROM post WHERE discord_server_id = $1{user_query}{interval_query} ORDER BY upvotes DESC LIMIT 5"
+	@commands.is_owner()
+	@karma.command(name="ledger", hidden=True, usage="ledger [repair]")
+	async def karma_ledger(self, ctx: commands.Context, action: str = None):
+		"""
+		Takes a karma snapshot from the ledger and shows users whose karma drifted from it.
+		Use `repair` to reset their karma to the ledger balance.
+		"""
+		repair = action == "repair"
+		async with ctx.typing():
+			drift = await self._snapshot_karma(repair=repair)
+
+		lines = [
+			f"<@{row['discord_user_id']}> `{row['discord_server_id']}`: `{row['actual']}` (ledger: `{row['expected']}`)"
+			for row in drift[:15]
+		]
+		embed = discord.Embed(title="Karma Ledger", color=core.constants.PRIMARY_COLOR)
+		embed.description = "\n".join(lines) or "Karma matches the ledger."
+		embed.set_footer(text=f"{len(drift)} drifted balances{' repaired' if repair else ''}")
+		await ctx.send(embed=embed)
+
+	@post.command(name="reconcile", usage="reconcile [restart|cancel]")
+	@commands.is_owner()
+	async def post_reconcile(self, ctx: commands.Context, action: str = None):
+		"""
+		Recounts the votes of all posts and of the recent vote channel history of the server and corrects karma.
+		The job runs in the background and continues where it left off after restarts.
+		Use `restart` to start over or `cancel` to stop it.
+		"""
+		guild_id = ctx.guild.id
+		running = guild_id in self._reconciliations
+		if action == "cancel":
+			if running:
+				self._reconciliations[guild_id].cancel()
+			await self.bot.db.pool.execute("DELETE FROM post_reconciliation WHERE discord_server_id = $1", guild_id)
+			return await ctx.send(embed=discord.Embed(description="Post reconciliation cancelled."))
+
+		checkpoint = await self.bot.db.pool.fetchrow(
+			"SELECT * FROM post_reconciliation WHERE discord_server_id = $1", guild_id
+		)
+		if action == "restart" or checkpoint is None or (checkpoint["finished_at"] is not None and not running):
+			if running:
+				self._reconciliations[guild_id].cancel()
+			checkpoint = await self.bot.db.pool.fetchrow(RECONCILE_RESET_QUERY, guild_id)
+			running = False
+		if not running and checkpoint["finished_at"] is None:
+			self._start_reconciliation(guild_id)
+
+		status = "finished" if checkpoint["finished_at"] is not None else f"running ({checkpoint['phase']})"
+		embed = discord.Embed(title="Post Reconciliation", color=core.constants.PRIMARY_COLOR)
+		embed.description = (
+			f"Status: `{status}`\n"
+			f"Checked posts: `{checkpoint['checked_posts']}`\n"
+			f"Corrected posts: `{checkpoint['corrected_posts']}`\n"
+			f"Started: <t:{int(checkpoint['started_at'].replace(tzinfo=timezone.utc).timestamp())}:R>"
 		)
-		params = (ctx.guild.id, user.id) if user else (ctx.guild.id,)
-		posts = await self.bot.db.pool.fetch(stmt, *params)
-		return await self._create_post_leaderboard(posts)
+		await ctx.send(embed=embed)
+
+	def _start_reconciliation(self, guild_id: int) -> None:
+		task = asyncio.create_task(self._reconcile_posts(guild_id))
+		self._reconciliations[guild_id] = task
+		task.add_done_callback(lambda _: self._reconciliations.pop(guild_id, None))
+
+	async def _reconcile_posts(self, guild_id: int) -> None:
+		await self.bot.wait_until_ready()
+		try:
+			checkpoint = await self.bot.db.pool.fetchrow(
+				"SELECT * FROM post_reconciliation WHERE discord_server_id = $1", guild_id
+			)
+			if checkpoint is None or checkpoint["finished_at"] is not None:
+				return
+			logger.info(f"Reconciling posts of server {guild_id} from {checkpoint['phase']} checkpoint")
+			karma_emotes = self._get_karma_emotes(guild_id)
+			semaphore = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+			if checkpoint["phase"] == "posts":
+				last_message_id = checkpoint["last_message_id"]
+				while posts := await self.bot.db.pool.fetch(
+					RECONCILE_POSTS_QUERY, guild_id, last_message_id, RECONCILE_BATCH_SIZE
+				):
+					# No flush runs while the messages are fetched. Votes buffered in the meantime are flushed right
+					# before the recount replaces them, so none stays buffered on top of a count that includes it.
+					async with self._votes_flush_lock:
+						messages = await asyncio.gather(
+							*[self._fetch_reconciled_message(semaphore, guild_id, post) for post in posts]
+						)
+						await self._flush_before_recount()
+						corrections = [
+							(
+								post["discord_message_id"],
+								post["discord_user_id"],
+								post["discord_channel_id"],
+								post["created_at"],
+							)
+							+ _count_karma_votes(message, karma_emotes)
+							for post, message in zip(posts, messages)
+							if message is not None
+						]
+						last_message_id = posts[-1]["discord_message_id"]
+						await self._apply_reconciliation(
+							guild_id, corrections, {}, "posts", last_message_id, 0, len(posts)
+						)
+				await self._apply_reconciliation(guild_id, [], {}, "history", 0, 0, 0)
+
+			last_channel_id = checkpoint["last_channel_id"]
+			guild = self.bot.get_guild(guild_id)
+			channels = [guild.get_channel(channel_id) for channel_id in self.vote_channels] if guild else []
+			channels = [channel for channel in channels if isinstance(channel, discord.abc.Messageable)]
+			for channel in sorted(channels, key=lambda channel: channel.id):
+				if channel.id <= last_channel_id:
+					continue
+				await self._reconcile_channel_history(guild_id, channel, karma_emotes, last_channel_id)
+				last_channel_id = channel.id
+
+			await self.bot.db.pool.execute(
+				"UPDATE post_reconciliation SET finished_at = NOW() WHERE discord_server_id = $1", guild_id
+			)
+			logger.info(f"Finished reconciling posts of server {guild_id}")
+		except asyncio.CancelledError:
+			raise
+		except Exception:
+			logger.exception(f"Post reconciliation of server {guild_id} failed, it resumes on the next start")
+
+	async def _fetch_reconciled_message(
+		self, semaphore: asyncio.Semaphore, guild_id: int, post: Record
+	) -> discord.Message | None:
+		async with semaphore:
+			channel = self.bot.get_partial_messageable(post["discord_channel_id"], guild_id=guild_id)
+			try:
+				return await channel.fetch_message(post["discord_message_id"])
+			except (discord.NotFound, discord.Forbidden) as error:
+				logger.debug(f"Skipping post {post['discord_message_id']} during reconciliation: {error}")
+				return None
+
+	async def _reconcile_channel_history(
+		self,
+		guild_id: int,
+		channel: discord.abc.Messageable,
+		karma_emotes: tuple[frozenset[int], frozenset[int]],
+		last_channel_id: int,
+	) -> None:
+		"""Recounts the recent messages of a vote channel, which also adds posts that were voted on while offline.
+
+		Every chunk of history is read right before it is written, under the flush lock like the posts phase.
+		"""
+		checked = 0
+		before = None
+		while True:
+			limit = min(RECONCILE_BATCH_SIZE, RECONCILE_HISTORY_LIMIT - checked)
+			async with self._votes_flush_lock:
+				chunk = [message async for message in channel.history(limit=limit, before=before)]
+				await self._flush_before_recount()
+				checked += len(chunk)
+				corrections = []
+				authors: dict[int, tuple[str, str]] = {}
+				for message in chunk:
+					if message.author.bot:
+						continue
+					upvotes, downvotes = _count_karma_votes(message, karma_emotes)
+					if not upvotes and not downvotes:
+						continue
+					created_at = message.created_at.replace(tzinfo=None)
+					corrections.append((message.id, message.author.id, channel.id, created_at, upvotes, downvotes))
+					authors[message.author.id] = (message.author.name, message.author.display_avatar.url)
+				is_last_chunk = len(chunk) < limit or checked >= RECONCILE_HISTORY_LIMIT
+				checkpoint_channel_id = channel.id if is_last_chunk else last_channel_id
+				await self._apply_reconciliation(
+					guild_id, corrections, authors, "history", 0, checkpoint_channel_id, len(chunk)
+				)
+			if is_last_chunk:
+				return
+			before = chunk[-1]
+
+	async def _flush_before_recount(self) -> None:
+		if not await self._flush_votes_locked():
+			raise RuntimeError("Buffered votes could not be flushed before recounting posts")
+
+	async def _apply_reconciliation(
+		self,
+		guild_id: int,
+		corrections: list[tuple[int, int, int, datetime, int, int]],
+		authors: dict[int, tuple[str, str]],
+		phase: str,
+		last_message_id: int,
+		last_channel_id: int,
+		checked: int,
+	) -> None:
+		"""Writes recounted posts, the caller holds the flush lock when there are corrections."""
+		columns = [list(column) for column in zip(*corrections)] or [[] for _ in range(6)]
+		async with self.bot.db.pool.acquire() as conn, conn.transaction():
+			differences = await conn.fetch(
+				RECONCILE_APPLY_QUERY,
+				guild_id,
+				*columns,
+				list(authors),
+				[name for name, _ in authors.values()],
+				[avatar for _, avatar in authors.values()],
+				phase,
+				last_message_id,
+				last_channel_id,
+				checked,
+			)
+			await self._ledger.write(
+				conn,
+				*[
+					_KarmaLedger.entry(
+						difference["discord_user_id"],
+						guild_id,
+						difference["karma_difference"],
+						"reconcile",
+						difference["discord_message_id"],
+					)
+					for difference in differences
+				],
+			)
+		ranking = self._get_ranking(guild_id)
+		for difference in differences:
+			ranking.add(difference["discord_user_id"], difference["karma_difference"])
 
 	@post.command(name="check", aliases=["c"], usage="check <post id>")
 	@commands.is_owner()
@@ -654,28 +2008,22 @@ class Karma(commands.Cog):
 			embed = discord.Embed(title="That post does not exist.")
 			return await ctx.reply(embed=embed)
 
-		server_upvote_emotes = await self._get_karma_upvote_emotes(ctx.guild.id)
-		server_downvote_emotes = await self._get_karma_downvote_emotes(ctx.guild.id)
-
 		channel = await self.bot.fetch_channel(post["discord_channel_id"])
 		message = await channel.fetch_message(post["discord_message_id"])
-
-		upvotes = 0
-		downvotes = 0
-		for reaction in message.reactions:
-			if isinstance(reaction.emoji, (discord.Emoji, discord.PartialEmoji)):
-				if reaction.emoji.id in server_upvote_emotes:
-					upvotes += reaction.count - 1
-				elif reaction.emoji.id in server_downvote_emotes:
-					downvotes += reaction.count - 1
+		upvotes, downvotes = _count_karma_votes(message, self._get_karma_emotes(ctx.guild.id))
 
 		old_upvotes = post["upvotes"]
 		old_downvotes = post["downvotes"]
 		karma_difference = (upvotes - old_upvotes) - (downvotes - old_downvotes)
 
 		update_post_query = "UPDATE post SET upvotes = $1, downvotes = $2 WHERE discord_message_id = $3"
-		await self.bot.db.pool.execute(UPSERT_KARMA_QUERY, message.author.id, message.guild.id, karma_difference)
-		await self.bot.db.pool.execute(update_post_query, upvotes, downvotes, post_id)
+		async with self.bot.db.pool.acquire() as conn, conn.transaction():
+			await conn.execute(UPSERT_KARMA_QUERY, message.author.id, message.guild.id, karma_difference)
+			await conn.execute(update_post_query, upvotes, downvotes, post_id)
+			await self._ledger.write(
+				conn, _KarmaLedger.entry(message.author.id, message.guild.id, karma_difference, "post_check", post_id)
+			)
+		self._get_ranking(message.guild.id).add(message.author.id, karma_difference)
 
 		embed_string = f"""
             Old post upvotes: {old_upvotes}, Old post downvotes: {old_downvotes}\n
@@ -688,7 +2036,7 @@ class Karma(commands.Cog):
 		if not ctx.interaction:
 			await ctx.message.delete()
 
-	async def _create_post_leaderboard(self, posts: list[Record]) -> str:
+	def _create_post_leaderboard(self, posts: list[Record], users: dict[int, discord.User | core.StoredUser]) -> str:
 		if not posts:
 			return "No posts found."
 		leaderboard = ""
@@ -696,7 +2044,7 @@ class Karma(commands.Cog):
 			jump_url = self._create_message_url(
 				post["discord_server_id"], post["discord_channel_id"], post["discord_message_id"]
 			)
-			username = self.bot.get_user(post["discord_user_id"]) or await self.bot.fetch_user(post["discord_user_id"])
+			username = users.get(post["discord_user_id"], "Unknown user")
 			leaderboard += f"**{index}.** [{username} ({post['upvotes']})]({jump_url})\n"
 		return leaderboard
 
@@ -762,12 +2110,15 @@ class Karma(commands.Cog):
 			await ctx.interaction.response.defer()
 
 		if winner in {1, 2}:
-			await self.win_kasino(kasino_id, winner)
-		elif winner == 3:
-			await self.abort_kasino(kasino_id)
+			results = await self.win_kasino(kasino_id, winner)
+		else:
+			results = await self.abort_kasino(kasino_id)
+		if results is None:
+			return await ctx.reply(f"Kasino with ID {kasino_id} is not open.")
 
-		await self.send_conclusion(ctx, kasino_id, winner)
-		await self.remove_kasino(kasino_id)
+		total_karma = sum(result["bet_amount"] for result in results)
+		await self.send_conclusion(ctx, kasino, total_karma, winner)
+		await self.remove_kasino_message(kasino)
 		if ctx.interaction:
 			await ctx.interaction.followup.send("Kasino closed.", ephemeral=True)
 
@@ -822,20 +2173,8 @@ class Karma(commands.Cog):
 			await self.bot.db.pool.execute(stmt_update_kasino, ctx.channel.id, new_kasino_msg.id, kasino_id)
 			await _update_kasino_msg(ctx.bot, kasino_id)
 
-	async def _get_karma_downvote_emotes(self, guild_id: int) -> list[int]:
-		stmt_downvotes = (
-			"SELECT discord_emote_id FROM karma_emote WHERE discord_server_id = $1 AND increase_karma = False"
-		)
-		emote_records = await self.bot.db.pool.fetch(stmt_downvotes, guild_id)
-		server_downvote_emotes = [emote["discord_emote_id"] for emote in emote_records]
-		server_downvote_emotes.append(int(core.constants.DOWNVOTE_EMOTE_ID))
-		return server_downvote_emotes
-
-	async def send_conclusion(self, ctx: commands.Context, kasino_id: int, winner: int):
-		kasino = await self.bot.db.pool.fetchrow("SELECT * FROM kasino WHERE id = $1", kasino_id)
-		total_karma = await self.bot.db.pool.fetchval(
-			"SELECT SUM(amount) FROM kasino_bet WHERE kasino_id = $1", kasino_id
-		)
+	async def send_conclusion(self, ctx: commands.Context, kasino: Record, total_karma: int, winner: int):
+		kasino_id: int = kasino["id"]
 		to_embed = discord.Embed(color=discord.Colour.from_rgb(52, 79, 235))
 
 		if winner in [1, 2]:
@@ -858,149 +2197,225 @@ class Karma(commands.Cog):
 		)
 		return
 
-	async def remove_kasino(self, kasino_id: int) -> None:
-		kasino = await self.bot.db.pool.fetchrow("SELECT * FROM kasino WHERE id = $1", kasino_id)
-		if kasino is None:
-			return
+	async def reconcile_kasinos(self) -> None:
+		"""Checks the pool and participant counters of all kasinos against their bets and repairs drift."""
+		drifted = await self.bot.db.pool.fetch(KASINO_RECONCILE_QUERY)
+		for record in drifted:
+			logger.warning(f"Kasino {record['id']} counters drifted from its bets and were reconciled")
+			self._kasino_renderer.kasinos.pop(record["id"], None)
+
+	async def _rehydrate_kasinos(self) -> None:
+		"""Caches all open kasinos with one query.
+
+		Their messages are not edited, the dynamic buttons resolve from their custom ids without a re-render.
+		"""
+		kasinos = await self.bot.db.pool.fetch("SELECT * FROM kasino")
+		for kasino in kasinos:
+			self._kasino_renderer.kasinos[kasino["id"]] = kasino
+		logger.info(f"Rehydrated {len(kasinos)} open kasinos")
+
+	async def _migrate_kasino_buttons(self) -> None:
+		"""Re-renders the open kasinos whose messages still carry buttons from before the dynamic items, once."""
+		await self.bot.wait_until_ready()
+		migrated = 0
+		for kasino in list(self._kasino_renderer.kasinos.values()):
+			channel = self.bot.get_partial_messageable(
+				kasino["discord_channel_id"], guild_id=kasino["discord_server_id"]
+			)
+			try:
+				message = await channel.fetch_message(kasino["discord_message_id"])
+			except discord.HTTPException as e:
+				logger.debug(f"Skipping button migration of kasino {kasino['id']}: {e}")
+				continue
+			if _has_legacy_kasino_buttons(message):
+				self._kasino_renderer.schedule(kasino["id"])
+				migrated += 1
+		if migrated:
+			logger.info(f"Re-rendering {migrated} kasinos with buttons from before the dynamic items")
+
+	async def remove_kasino_message(self, kasino: Record) -> None:
+		"""Deletes the message of a closed kasino."""
 		try:
 			kasino_channel = await self.bot.fetch_channel(kasino["discord_channel_id"])
 			kasino_msg = await kasino_channel.fetch_message(kasino["discord_message_id"])
 			await kasino_msg.delete()
 		except discord.errors.NotFound:
 			pass
-		await self.bot.db.pool.execute("DELETE FROM kasino WHERE id = $1", kasino_id)
-
-	async def abort_kasino(self, kasino_id: int) -> None:
-		stmt_kasino_and_bets = """SELECT * FROM kasino JOIN kasino_bet ON kasino.id = kasino_bet.kasino_id
-                                  WHERE kasino.id = $1"""
-		kasino_and_bets = await self.bot.db.pool.fetch(stmt_kasino_and_bets, kasino_id)
-		stmt_update_user_karma = """UPDATE karma SET amount = amount + $1
-                                    WHERE discord_user_id = $2 AND discord_server_id = $3"""
-		for bet in kasino_and_bets:
-			await self.bot.db.pool.execute(
-				stmt_update_user_karma, bet["amount"], bet["discord_user_id"], bet["discord_server_id"]
-			)
-			user_karma = await self._get_user_karma(bet["discord_user_id"], bet["discord_server_id"])
-			output = discord.Embed(
-				title=f"**You have been refunded {bet['amount']} karma.**",
-				color=discord.Colour.from_rgb(52, 79, 235),
-				description=f"Question was: {bet['question']}\n' f'Remaining karma: {user_karma}",
-			)
-			user = self.bot.get_user(bet["discord_user_id"]) or await self.bot.fetch_user(bet["discord_user_id"])
-			try:
-				await user.send(embed=output)
-			except discord.errors.Forbidden:
-				logger.warning(f"Could not send kasino abort to {user.id}")
-
-	async def win_kasino(self, kasino_id: int, winning_option: int) -> None:
-		"""Distributes karma to winners and notifies all participants of the kasino result."""
-		kasino: Record = await self.bot.db.pool.fetchrow(
-			"SELECT discord_server_id, question FROM kasino WHERE id = $1", kasino_id
-		)
-		if not kasino:
-			logger.error(f"Kasino {kasino_id} not found when trying to distribute winnings.")
-			return
+		self._kasino_renderer.forget(kasino["id"])
 
-		server_id: int = kasino["discord_server_id"]
-		question: str = kasino["question"]
+	async def abort_kasino(self, kasino_id: int) -> list[Record] | None:
+		"""Refunds all bets and deletes the kasino in one transaction and notifies the bettors.
 
-		all_bets: list[Record] = await self.bot.db.pool.fetch(
-			"SELECT discord_user_id, amount, option FROM kasino_bet WHERE kasino_id = $1", kasino_id
-		)
-		if not all_bets:
-			logger.warning(f"Kasino {kasino_id} closed with no bets placed.")
-			return
+		Returns the bet and new balance of every bettor, or None if the kasino was already closed.
+		"""
+		async with self.bot.db.pool.acquire() as conn:
+			async with conn.transaction():
+				kasino = await conn.fetchrow(KASINO_CLOSE_QUERY, kasino_id)
+				if kasino is None:
+					logger.warning(f"Kasino {kasino_id} was already closed when trying to refund bets.")
+					return None
+				bets = await conn.fetch(KASINO_BETS_QUERY, kasino_id)
+				refunds = {bet["discord_user_id"]: bet["amount"] for bet in bets}
+				results = await self._pay_out_kasino(
+					conn, kasino_id, kasino["discord_server_id"], refunds, "kasino_refund"
+				)
 
-		total_pool: int = sum(bet["amount"] for bet in all_bets)
-		winner_bets: list[Record] = [bet for bet in all_bets if bet["option"] == winning_option]
-		loser_bets: list[Record] = [bet for bet in all_bets if bet["option"] != winning_option]
-		winner_pool: int = sum(bet["amount"] for bet in winner_bets)
+				messages = []
+				for result in results:
+					output = discord.Embed(
+						title=f"**You have been refunded {result['bet_amount']} karma.**",
+						color=discord.Colour.from_rgb(52, 79, 235),
+						description=f"Question was: {kasino['question']}\nRemaining karma: {result['balance']}",
+					)
+					dedupe_key = f"kasino:{kasino_id}:refund:{result['discord_user_id']}"
+					messages.append(
+						core.OutboxMessage.dm(result["discord_user_id"], embed=output, dedupe_key=dedupe_key)
+					)
+				await self.bot.outbox.enqueue(*messages, connection=conn)
+				await conn.execute("DELETE FROM kasino WHERE id = $1", kasino_id)
 
-		# Guard: No winners (everyone bet on the losing side)
-		if winner_pool == 0:
-			logger.info(f"Kasino {kasino_id}: No winners. All karma goes to the void.")
-			for bet in loser_bets:
-				await self._send_kasino_result_dm(bet["discord_user_id"], server_id, question, bet, win_amount=0)
-			return
+		self._rank_kasino_payouts(kasino["discord_server_id"], results, refunds)
+		return results
 
-		stmt_update_karma = """
-			UPDATE karma SET amount = amount + $1
-			WHERE discord_user_id = $2 AND discord_server_id = $3
-		"""
-		for bet in winner_bets:
-			user_id: int = bet["discord_user_id"]
-			win_ratio: float = bet["amount"] / winner_pool
-			win_amount: int = round(win_ratio * total_pool)
+	async def win_kasino(self, kasino_id: int, winning_option: int) -> list[Record] | None:
+		"""Distributes karma to winners and deletes the kasino in one transaction and notifies all participants.
 
-			await self.bot.db.pool.execute(stmt_update_karma, win_amount, user_id, server_id)
-			await self._send_kasino_result_dm(user_id, server_id, question, bet, win_amount)
+		Returns the bet and new balance of every bettor, or None if the kasino was already closed.
+		"""
+		async with self.bot.db.pool.acquire() as conn:
+			async with conn.transaction():
+				kasino = await conn.fetchrow(KASINO_CLOSE_QUERY, kasino_id)
+				if kasino is None:
+					logger.warning(f"Kasino {kasino_id} was already closed when trying to distribute winnings.")
+					return None
+				server_id: int = kasino["discord_server_id"]
+				question: str = kasino["question"]
+
+				all_bets: list[Record] = await conn.fetch(KASINO_BETS_QUERY, kasino_id)
+				if not all_bets:
+					logger.warning(f"Kasino {kasino_id} closed with no bets placed.")
+					await conn.execute("DELETE FROM kasino WHERE id = $1", kasino_id)
+					return []
+
+				total_pool: int = sum(bet["amount"] for bet in all_bets)
+				winner_bets: list[Record] = [bet for bet in all_bets if bet["option"] == winning_option]
+				winner_pool: int = sum(bet["amount"] for bet in winner_bets)
+
+				winnings: dict[int, int] = {}
+				if winner_pool:
+					for bet in winner_bets:
+						win_ratio: float = bet["amount"] / winner_pool
+						winnings[bet["discord_user_id"]] = round(win_ratio * total_pool)
+				results = await self._pay_out_kasino(conn, kasino_id, server_id, winnings, "kasino_payout")
+
+				messages = [
+					self._create_kasino_result_dm(
+						kasino_id, question, result, winnings.get(result["discord_user_id"], 0)
+					)
+					for result in results
+				]
+				await self.bot.outbox.enqueue(*messages, connection=conn)
+				await conn.execute("DELETE FROM kasino WHERE id = $1", kasino_id)
 
-		for bet in loser_bets:
-			await self._send_kasino_result_dm(bet["discord_user_id"], server_id, question, bet, win_amount=0)
+		self._rank_kasino_payouts(server_id, results, winnings)
+		# Guard: No winners (everyone bet on the losing side)
+		if winner_pool == 0:
+			logger.info(f"Kasino {kasino_id}: No winners. All karma goes to the void.")
+		return results
 
-	async def _send_kasino_result_dm(
-		self, user_id: int, server_id: int, question: str, bet: Record, win_amount: int
-	) -> None:
-		"""Send a DM to a user with their kasino result (win or loss)."""
-		user_karma = await self._get_user_karma(user_id, server_id)
+	async def _pay_out_kasino(
+		self, conn: Connection, kasino_id: int, server_id: int, payouts: dict[int, int], reason: str
+	) -> list[Record]:
+		"""Credits all payouts with one statement and returns the bet and new balance of every bettor.
 
+		Only writes to the database, the rankings are updated with `_rank_kasino_payouts` once the transaction committed.
+		"""
+		results = await conn.fetch(KASINO_PAYOUT_QUERY, server_id, list(payouts), list(payouts.values()), kasino_id)
+		await self._ledger.write(
+			conn,
+			*[
+				_KarmaLedger.entry(
+					result["discord_user_id"], server_id, payouts[result["discord_user_id"]], reason, kasino_id
+				)
+				for result in results
+				if result["discord_user_id"] in payouts and result["balance"] is not None
+			],
+		)
+		return results
+
+	def _rank_kasino_payouts(self, server_id: int, results: list[Record], payouts: dict[int, int]) -> None:
+		ranking = self._get_ranking(server_id)
+		for result in results:
+			if result["discord_user_id"] in payouts and result["balance"] is not None:
+				ranking.set(result["discord_user_id"], result["balance"])
+
+	def _create_kasino_result_dm(
+		self, kasino_id: int, question: str, result: Record, win_amount: int
+	) -> core.OutboxMessage:
+		"""Creates the DM telling a bettor their kasino result (win or loss)."""
 		if win_amount > 0:
 			title = f":tada: **You have won {win_amount} karma!** :tada:"
 			color = discord.Colour.from_rgb(66, 186, 50)
-			description = f"Of which `{bet['amount']}` you put down on the table"
+			description = f"Of which `{result['bet_amount']}` you put down on the table"
 		else:
-			title = f":chart_with_downwards_trend: **You have unfortunately lost {bet['amount']} karma...** :chart_with_downwards_trend:"
+			title = f":chart_with_downwards_trend: **You have unfortunately lost {result['bet_amount']} karma...** :chart_with_downwards_trend:"
 			color = discord.Colour.from_rgb(209, 25, 25)
 			description = None
 
 		embed = discord.Embed(title=title, color=color, description=description)
 		embed.add_field(name="Question was:", value=question, inline=False)
-		embed.add_field(name="New karma balance:", value=user_karma, inline=False)
+		embed.add_field(name="New karma balance:", value=result["balance"], inline=False)
 
-		user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
-		try:
-			await user.send(embed=embed)
-		except discord.errors.Forbidden:
-			logger.warning(f"Could not send kasino result DM to user {user_id}")
-
-
-async def _update_kasino_msg(bot: core.Substiify, kasino_id: int) -> discord.Message:
-	kasino = await bot.db.pool.fetchrow("SELECT * FROM kasino WHERE id = $1", kasino_id)
-	kasino_channel = await bot.fetch_channel(kasino["discord_channel_id"])
-	kasino_msg = await kasino_channel.fetch_message(kasino["discord_message_id"])
-
-	# FIGURE OUT AMOUNTS AND ODDS
-	stmt_kasino_bets_sum = """SELECT SUM(amount) FROM kasino_bet WHERE kasino_id = $1 AND option = $2"""
-	bets_a_amount: int = await bot.db.pool.fetchval(stmt_kasino_bets_sum, kasino_id, 1) or 0
-	bets_b_amount: int = await bot.db.pool.fetchval(stmt_kasino_bets_sum, kasino_id, 2) or 0
-	a_odds, b_odds = _calculate_odds(bets_a_amount, bets_b_amount)
-
-	# CREATE MESSAGE
-	description = "The kasino has been opened! Place your bets! :game_die:"
-	if kasino["locked"]:
-		description = "The kasino is locked! No more bets are taken in. Time to wait and see..."
-
-	participants = await bot.db.pool.fetchval("SELECT COUNT(*) FROM kasino_bet WHERE kasino_id = $1", kasino_id)
-	description += f"\n**Participants:** `{participants}`"
-
-	title = f":game_die: {kasino['question']}"
-	color = discord.Colour.from_rgb(52, 79, 235)
-	if kasino["locked"]:
-		title = f"[LOCKED] {title}"
-		color = discord.Colour.from_rgb(209, 25, 25)
-
-	embed = discord.Embed(title=title, description=description, color=color)
-	embed.set_footer(text=f"On the table: {bets_a_amount + bets_b_amount} Karma | ID: {kasino_id}")
-	embed.set_thumbnail(url="https://cdn.betterttv.net/emote/602548a4d47a0b2db8d1a3b8/3x.gif")
-	embed.add_field(
-		name=f"**1:** {kasino['option1']}", value=f"**Odds:** 1:{round(a_odds, 3)}\n**Pool:** {bets_a_amount} Karma"
-	)
-	embed.add_field(
-		name=f"**2:** {kasino['option2']}", value=f"**Odds:** 1:{round(b_odds, 3)}\n**Pool:** {bets_b_amount} Karma"
+		user_id: int = result["discord_user_id"]
+		return core.OutboxMessage.dm(user_id, embed=embed, dedupe_key=f"kasino:{kasino_id}:result:{user_id}")
+
+
+def _has_legacy_kasino_buttons(message: discord.Message) -> bool:
+	return any(
+		child.custom_id is not None and not child.custom_id.startswith("kasino:")
+		for row in message.components
+		if isinstance(row, discord.ActionRow)
+		for child in row.children
+		if isinstance(child, discord.Button)
 	)
 
-	await kasino_msg.edit(embed=embed, view=KasinoView(kasino))
-	return kasino_msg
+
+def _group_karma_emotes(records: list[Record]) -> dict[int, tuple[frozenset[int], frozenset[int]]]:
+	"""Groups karma_emote rows into per-server (upvote, downvote) sets including the default vote emotes."""
+	grouped: dict[int, tuple[set[int], set[int]]] = {}
+	for record in records:
+		upvotes, downvotes = grouped.setdefault(
+			record["discord_server_id"], (set(DEFAULT_KARMA_EMOTES[0]), set(DEFAULT_KARMA_EMOTES[1]))
+		)
+		if record["increase_karma"] is True:
+			upvotes.add(record["discord_emote_id"])
+		elif record["increase_karma"] is False:
+			downvotes.add(record["discord_emote_id"])
+	return {server_id: (frozenset(up), frozenset(down)) for server_id, (up, down) in grouped.items()}
+
+
+def _count_karma_votes(
+	message: discord.Message, karma_emotes: tuple[frozenset[int], frozenset[int]]
+) -> tuple[int, int]:
+	"""Counts the up- and downvotes on a message, without the reactions added by the bot itself."""
+	upvote_emotes, downvote_emotes = karma_emotes
+	upvotes = 0
+	downvotes = 0
+	for reaction in message.reactions:
+		if not isinstance(reaction.emoji, (discord.Emoji, discord.PartialEmoji)):
+			continue
+		count = reaction.count - 1 if reaction.me else reaction.count
+		if reaction.emoji.id in upvote_emotes:
+			upvotes += count
+		elif reaction.emoji.id in downvote_emotes:
+			downvotes += count
+	return upvotes, downvotes
+
+
+async def _update_kasino_msg(bot: core.Substiify, kasino_id: int) -> discord.PartialMessage | None:
+	"""Re-renders the kasino message right away from a freshly loaded kasino."""
+	karma_cog: Karma = bot.get_cog("Karma")
+	return await karma_cog._kasino_renderer.render(kasino_id, reload=True)
 
 
 def _calculate_odds(bets_a_amount: int, bets_b_amount: int) -> tuple[float, float]:
@@ -1010,63 +2425,132 @@ def _calculate_odds(bets_a_amount: int, bets_b_amount: int) -> tuple[float, floa
 	return a_odds, b_odds
 
 
+class KarmaLeaderboardView(discord.ui.View):
+	def __init__(self, cog: Karma, author_id: int, ranking: utils.RankedIndex):
+		super().__init__(timeout=120)
+		self.cog = cog
+		self.author_id = author_id
+		self.ranking = ranking
+		self.page = 0
+		self.message: discord.Message | None = None
+
+	@property
+	def page_count(self) -> int:
+		return max(math.ceil(len(self.ranking) / LEADERBOARD_PAGE_SIZE), 1)
+
+	async def create_embed(self) -> discord.Embed:
+		self.page = max(min(self.page, self.page_count - 1), 0)
+		offset = self.page * LEADERBOARD_PAGE_SIZE
+		entries = self.ranking.page(offset, LEADERBOARD_PAGE_SIZE)
+		embed = await self.cog._create_karma_leaderboard_embed(entries, start=offset + 1)
+		embed.set_footer(text=f"Page {self.page + 1}/{self.page_count}")
+		self.previous_page.disabled = self.page == 0
+		self.next_page.disabled = self.page >= self.page_count - 1
+		return embed
+
+	async def interaction_check(self, interaction: discord.Interaction) -> bool:
+		if interaction.user.id != self.author_id:
+			await interaction.response.send_message("Only the author of the command can change pages.", ephemeral=True)
+			return False
+		return True
+
+	async def on_timeout(self) -> None:
+		if self.message is None:
+			return
+		try:
+			await self.message.edit(view=None)
+		except discord.HTTPException:
+			pass
+
+	@discord.ui.button(emoji="◀️", style=discord.ButtonStyle.grey)
+	async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+		self.page -= 1
+		await interaction.response.edit_message(embed=await self.create_embed(), view=self)
+
+	@discord.ui.button(emoji="▶️", style=discord.ButtonStyle.grey)
+	async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+		self.page += 1
+		await interaction.response.edit_message(embed=await self.create_embed(), view=self)
+
+
 class KasinoView(discord.ui.View):
 	def __init__(self, kasino: Record):
 		super().__init__(timeout=None)
-		self.kasino = kasino
 		if not kasino["locked"]:
-			self.add_item(KasinoBetButton(1))
-			self.add_item(KasinoBetButton(2))
-		self.add_item(KasinoLockButton(kasino))
+			self.add_item(KasinoBetButton(kasino["id"], 1))
+			self.add_item(KasinoBetButton(kasino["id"], 2))
+		self.add_item(KasinoLockButton(kasino["id"], kasino["locked"]))
 
 
-class KasinoBetButton(discord.ui.Button):
-	def __init__(self, option: int):
-		gamba_emoji = discord.PartialEmoji.from_str("karmabet:817354842699857920")
+class KasinoBetButton(
+	discord.ui.DynamicItem[discord.ui.Button], template=r"kasino:bet:(?P<kasino_id>\d+):(?P<option>\d)"
+):
+	def __init__(self, kasino_id: int, option: int):
+		self.kasino_id = kasino_id
 		self.option = option
-		super().__init__(label=f"Bet: {option}", emoji=gamba_emoji, style=discord.ButtonStyle.blurple)
+		gamba_emoji = discord.PartialEmoji.from_str("karmabet:817354842699857920")
+		super().__init__(
+			discord.ui.Button(
+				label=f"Bet: {option}",
+				emoji=gamba_emoji,
+				style=discord.ButtonStyle.blurple,
+				custom_id=f"kasino:bet:{kasino_id}:{option}",
+			)
+		)
+
+	@classmethod
+	async def from_custom_id(
+		cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match[str]
+	) -> "KasinoBetButton":
+		return cls(int(match["kasino_id"]), int(match["option"]))
 
 	async def callback(self, interaction: discord.Interaction):
 		bot: core.Substiify = interaction.client
-		if self.view.kasino["locked"]:
+		kasino = await bot.db.pool.fetchrow(KASINO_BET_STATE_QUERY, self.kasino_id, interaction.user.id)
+		if kasino is None:
+			return await interaction.response.send_message("This kasino does not exist anymore.", ephemeral=True)
+		if kasino["locked"]:
 			return await interaction.response.send_message(
 				"The kasino is locked! No more bets are taken in. Time to wait and see...", ephemeral=True
 			)
-
-		user_karma_query = "SELECT amount FROM karma WHERE discord_user_id = $1 AND discord_server_id = $2"
-		bettor_karma = await bot.db.pool.fetchval(user_karma_query, interaction.user.id, interaction.guild.id)
-		if bettor_karma is None:
+		if kasino["balance"] is None:
 			return await interaction.response.send_message("You don't have any karma!", ephemeral=True)
-
-		stmt_bet = "SELECT * FROM kasino_bet WHERE kasino_id = $1 AND discord_user_id = $2;"
-		user_bet = await bot.db.pool.fetchrow(stmt_bet, self.view.kasino["id"], interaction.user.id)
-		if user_bet and user_bet["option"] != self.option:
+		if kasino["bet_option"] is not None and kasino["bet_option"] != self.option:
 			return await interaction.response.send_message(
 				"You can't change your choice on the bet. No chickening out!", ephemeral=True
 			)
 
-		modal = KasinoBetModal(self.view.kasino, bettor_karma, user_bet, self.option)
+		modal = KasinoBetModal(kasino, kasino["balance"], kasino["bet_option"] is not None, self.option)
 		await interaction.response.send_modal(modal)
 
 
-class KasinoLockButton(discord.ui.Button):
-	def __init__(self, kasino: Record):
-		locked = kasino["locked"]
-		self.lock_settings = {
-			True: ("Unlock", "🔐", discord.ButtonStyle.red),
-			False: ("Lock", "🔒", discord.ButtonStyle.grey),
-		}
+class KasinoLockButton(discord.ui.DynamicItem[discord.ui.Button], template=r"kasino:lock:(?P<kasino_id>\d+)"):
+	lock_settings = {
+		True: ("Unlock", "🔐", discord.ButtonStyle.red),
+		False: ("Lock", "🔒", discord.ButtonStyle.grey),
+	}
+
+	def __init__(self, kasino_id: int, locked: bool = False):
+		self.kasino_id = kasino_id
 		label, emoji, style = self.lock_settings[locked]
-		super().__init__(label=label, emoji=emoji, style=style)
+		super().__init__(discord.ui.Button(label=label, emoji=emoji, style=style, custom_id=f"kasino:lock:{kasino_id}"))
+
+	@classmethod
+	async def from_custom_id(
+		cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match[str]
+	) -> "KasinoLockButton":
+		return cls(int(match["kasino_id"]))
 
 	async def callback(self, interaction: discord.Interaction):
 		bot: core.Substiify = interaction.client
-		kasino_id = self.view.kasino["id"]
+		kasino_id = self.kasino_id
 		if not interaction.user.guild_permissions.manage_channels and not await bot.is_owner(interaction.user):
 			return await interaction.response.send_message(
 				"You don't have permission to lock the kasino!", ephemeral=True
 			)
 		is_locked = await bot.db.pool.fetchval("SELECT locked FROM kasino WHERE id = $1", kasino_id)
+		if is_locked is None:
+			return await interaction.response.send_message("This kasino does not exist anymore.", ephemeral=True)
 		if is_locked:
 			label_str = f"""Are you sure you want to unlock kasino ID: `{kasino_id}`?
 					To make it fair, all people who bet will get a message so they can increase their bets!
@@ -1081,13 +2565,11 @@ class KasinoLockButton(discord.ui.Button):
 		else:
 			await bot.db.pool.execute("UPDATE kasino SET locked = True WHERE id = $1", kasino_id)
 			await _update_kasino_msg(bot, kasino_id)
-			self.label, self.emoji, self.style = self.lock_settings[True]
-			await interaction.message.edit(view=self.view)
 			await interaction.response.send_message("Kasino locked!", ephemeral=True)
 
 
 class KasinoBetModal(discord.ui.Modal):
-	def __init__(self, kasino: Record, bettor_karma: int, user_bet: Record, option: int):
+	def __init__(self, kasino: Record, bettor_karma: int, has_bet: bool, option: int):
 		title = utils.ux.strip_emotes(kasino["question"])
 		if len(title) > 45:
 			title = title[:42] + "..."
@@ -1095,7 +2577,7 @@ class KasinoBetModal(discord.ui.Modal):
 		self.option = option
 		self.kasino = kasino
 		self.bettor_karma = bettor_karma
-		self.user_bet = user_bet
+		self.has_bet = has_bet
 		option_str = kasino[f"option{option}"]
 		label_str = f"Bet for option: {option_str}"
 		if len(label_str) > 45:
@@ -1121,13 +2603,9 @@ class KasinoBetModal(discord.ui.Modal):
 				"The kasino is locked! No more bets are taken in. Time to wait and see...", ephemeral=True
 			)
 
-		output = "increased" if self.user_bet is not None else "added"
+		output = "increased" if self.has_bet else "added"
+		karma_cog: Karma = bot.get_cog("Karma")
 
-		stmt_bet = """INSERT INTO kasino_bet (kasino_id, discord_user_id, amount, option)
-					  VALUES ($1, $2, $3, $4)
-					  ON CONFLICT (kasino_id, discord_user_id)
-					  DO UPDATE SET amount = kasino_bet.amount + EXCLUDED.amount
-					  RETURNING amount"""
 		stmt_update_user_karma = """UPDATE karma
 								  SET amount = amount - $1
 								  WHERE discord_user_id = $2
@@ -1143,17 +2621,25 @@ class KasinoBetModal(discord.ui.Modal):
 					interaction.guild.id,
 				)
 				if remaining_karma is not None:
-					total_bet = await conn.fetchval(
-						stmt_bet,
+					kasino = await conn.fetchrow(
+						KASINO_BET_QUERY,
 						kasino_id,
 						interaction.user.id,
 						amount,
 						self.option,
 					)
+					await karma_cog._ledger.write(
+						conn,
+						_KarmaLedger.entry(interaction.user.id, interaction.guild.id, -amount, "kasino_bet", kasino_id),
+					)
 
 		if remaining_karma is None:
 			return await interaction.response.send_message("You don't have enough karma!", ephemeral=True)
 
+		karma_cog._get_ranking(interaction.guild.id).set(interaction.user.id, remaining_karma)
+		karma_cog._kasino_renderer.remember(kasino)
+		total_bet = kasino["total_bet"]
+
 		output_embed = discord.Embed(color=discord.Colour.from_rgb(209, 25, 25))
 		output_embed.title = f"**Successfully {output} bet on option {self.option}, on kasino with ID {kasino_id} for {amount} karma! Total bet is now: {total_bet} Karma**"
 		output_embed.color = discord.Colour.from_rgb(52, 79, 235)
@@ -1161,7 +2647,7 @@ class KasinoBetModal(discord.ui.Modal):
 
 		await interaction.response.send_message(embed=output_embed, ephemeral=True)
 		logger.info(f"Bet[user: {interaction.user}, amount: {amount}, option: {self.option}, kasino: {kasino_id}]")
-		await _update_kasino_msg(bot, kasino_id)
+		karma_cog._kasino_renderer.schedule(kasino_id)
 
 
 class KasinoConfirmUnlockView(discord.ui.View):
@@ -1177,11 +2663,16 @@ class KasinoConfirmUnlockView(discord.ui.View):
 				"You don't have permission to unlock the kasino!", ephemeral=True
 			)
 		kasino = await bot.db.pool.fetchrow("SELECT * FROM kasino WHERE id = $1", self.kasino_id)
+		if kasino is None:
+			return await interaction.response.send_message("This kasino does not exist anymore.", ephemeral=True)
 		is_locked = kasino["locked"]
 		if not is_locked:
 			return await interaction.response.send_message("Kasino is already unlocked!", ephemeral=True)
 		await bot.db.pool.execute("UPDATE kasino SET locked = False WHERE id = $1", self.kasino_id)
 		kasino_msg = await _update_kasino_msg(bot, self.kasino_id)
+		# The kasino can be closed while the confirmation is open.
+		if kasino_msg is None:
+			return await interaction.response.send_message("This kasino does not exist anymore.", ephemeral=True)
 		kasino_members = await bot.db.pool.fetch(
 			"SELECT discord_user_id FROM kasino_bet WHERE kasino_id = $1", self.kasino_id
 		)
@@ -1192,9 +2683,16 @@ class KasinoConfirmUnlockView(discord.ui.View):
 		)
 		embed.set_footer(text=f"Unlocked by {interaction.user}", icon_url=interaction.user.display_avatar)
 
-		for member in kasino_members:
-			user = bot.get_user(member["discord_user_id"]) or await bot.fetch_user(member["discord_user_id"])
-			await user.send(embed=embed)
+		await bot.outbox.enqueue(
+			*[
+				core.OutboxMessage.dm(
+					member["discord_user_id"],
+					embed=embed,
+					dedupe_key=f"kasino:{self.kasino_id}:unlock:{interaction.id}:{member['discord_user_id']}",
+				)
+				for member in kasino_members
+			]
+		)
 		await interaction.response.send_message("Kasino unlocked! All kasino members messaged.", ephemeral=True)
 
 
@@ -1204,5 +2702,5 @@ class NotEnoughArguments(commands.UserInputError):
 
 async def setup(bot: core.Substiify):
 	query = await bot.db.pool.fetch("SELECT * FROM discord_channel WHERE upvote = True")
-	upvote_channels = [channel["discord_channel_id"] for channel in query] or []
+	upvote_channels = {channel["discord_channel_id"] for channel in query}
 	await bot.add_cog(Karma(bot, upvote_channels))
@@ -280,7 +280,9 @@ class Owner(commands.Cog):
 
 		for post in await self.bot.db.pool.fetch("SELECT * FROM post"):
 			user_id = post["discord_user_id"]
-			discord_user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+			discord_user = await self.bot.user_resolver.fetch(user_id)
+			if discord_user is None:
+				continue
 			print(f"fetched user: {discord_user}...")
 			await self.bot.db.pool.execute(
 				dbc.USER_INSERT_QUERY, discord_user.id, discord_user.name, discord_user.display_avatar.url
@@ -290,7 +292,9 @@ class Owner(commands.Cog):
 			"SELECT discord_user_id FROM command_history GROUP BY discord_user_id"
 		):
 			user_id = command["discord_user_id"]
-			discord_user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+			discord_user = await self.bot.user_resolver.fetch(user_id)
+			if discord_user is None:
+				continue
 			await self.bot.db.pool.execute(
 				dbc.USER_INSERT_QUERY, discord_user.id, discord_user.name, discord_user.display_avatar.url
 			)
@@ -303,14 +307,17 @@ class Owner(commands.Cog):
 		"""
 		Generates test data for the database
 		"""
+		karma_cog = self.bot.get_cog("Karma")
+		if karma_cog is None:
+			return await ctx.send("The karma extension is not loaded.", delete_after=30)
 		# fetch all users from the server
+		balances = {}
 		async for user in ctx.guild.fetch_members(limit=None):
 			print(f"inserting user: {user}...")
 			await self.bot.db.pool.execute(dbc.USER_INSERT_QUERY, user.id, user.name, user.display_avatar.url)
-			stmt_insert_user_karma = """INSERT INTO karma (discord_user_id, discord_server_id, amount) VALUES ($1, $2, $3)
-                                        ON CONFLICT (discord_user_id, discord_server_id) DO UPDATE SET amount = $3"""
-			random_karma = random.randint(500, 3000)
-			await self.bot.db.pool.execute(stmt_insert_user_karma, user.id, ctx.guild.id, random_karma)
+			balances[user.id] = random.randint(500, 3000)
+		# Goes through the karma cog so the balances get opening ledger entries and show up on the leaderboard.
+		await karma_cog.set_karma(ctx.guild.id, balances, "opening")
 
 
 def create_command_usage_embed(results):
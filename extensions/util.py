@@ -245,15 +245,18 @@ class Util(commands.Cog):
 			return
 
 		author_id = giveaway["discord_user_id"]
-		author = self.bot.get_user(author_id) or await self.bot.fetch_user(author_id)
+		author = await self.bot.user_resolver.resolve(author_id) or f"<@{author_id}>"
 		reaction = discord.utils.find(lambda r: str(r.emoji) == "🎉", msg.reactions)
 		users = [] if reaction is None else [u async for u in reaction.users() if not u.bot]
 		prize = giveaway["prize"]
 		winners = self.get_giveaway_winners(msg)
 		embed = self.create_giveaway_embed(author, prize, winners)
 
-		await self.pick_winner(users, channel, prize, embed, msg, winners)
-		await msg.edit(embed=embed)
+		dedupe_key = f"giveaway:{giveaway['id']}"
+		await self.pick_winner(users, channel, prize, embed, msg, winners, dedupe_key=f"{dedupe_key}:result")
+		await self.bot.outbox.enqueue(
+			core.OutboxMessage.edit(channel.id, msg.id, embed=embed, dedupe_key=f"{dedupe_key}:edit")
+		)
 		await self.bot.db.pool.execute("DELETE FROM giveaway WHERE id = $1", giveaway["id"])
 
 	async def pick_winner(
@@ -264,6 +267,7 @@ class Util(commands.Cog):
 		embed: discord.Embed,
 		source_message: discord.Message | None = None,
 		winners_count: int = 1,
+		dedupe_key: str | None = None,
 	):
 		# Check if User list is not empty
 		if len(users) <= 0:
@@ -276,7 +280,7 @@ class Util(commands.Cog):
 			embed.remove_field(0)
 			embed.set_footer(text=message_text)
 			announce = discord.Embed(description=f"{message_text}{jump}", color=core.constants.PRIMARY_COLOR)
-			await channel.send(embed=announce)
+			await self.bot.outbox.enqueue(core.OutboxMessage.message(channel.id, embed=announce, dedupe_key=dedupe_key))
 		else:
 			unique = list({u.id: u for u in users}.values())
 			k = max(1, min(winners_count or 1, len(unique)))
@@ -295,7 +299,9 @@ class Util(commands.Cog):
 			if source_message is not None and source_message.guild is not None:
 				message_url = f"https://discord.com/channels/{source_message.guild.id}/{source_message.channel.id}/{source_message.id}"
 				win_text = f"{win_text} — [Jump to giveaway]({message_url})"
-			await channel.send(win_text)
+			await self.bot.outbox.enqueue(
+				core.OutboxMessage.message(channel.id, content=win_text, dedupe_key=dedupe_key)
+			)
 
 	async def get_giveaway_prize(self, msg: discord.Message):
 		return msg.embeds[0].description.split("Win **")[1].split("**!")[0]
@@ -329,7 +335,7 @@ class Util(commands.Cog):
 			description=f"Win **{prize}**!",
 			color=core.constants.CYAN_COLOR,
 		)
-		host = author.mention if isinstance(author, (discord.Member, discord.User)) else author
+		host = author.mention if isinstance(author, (discord.Member, discord.User, core.StoredUser)) else author
 		embed.add_field(name="Hosted By:", value=host)
 		embed.add_field(name="Winners:", value=str(winners))
 		return embed
@@ -64,6 +64,49 @@ CREATE TABLE IF NOT EXISTS karma (
   UNIQUE (discord_user_id, discord_server_id)
 );
 
+CREATE TABLE IF NOT EXISTS karma_ledger (
+  id BIGSERIAL PRIMARY KEY,
+  discord_user_id BIGINT NOT NULL,
+  discord_server_id BIGINT NOT NULL,
+  amount BIGINT NOT NULL,
+  reason VARCHAR(20) NOT NULL,
+  reference_id BIGINT,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS karma_snapshot (
+  discord_user_id BIGINT NOT NULL,
+  discord_server_id BIGINT NOT NULL,
+  amount BIGINT NOT NULL,
+  ledger_id BIGINT NOT NULL,
+  PRIMARY KEY (discord_user_id, discord_server_id)
+);
+
+-- Karma that existed before the ledger becomes its opening balance.
+INSERT INTO karma_ledger (discord_user_id, discord_server_id, amount, reason)
+SELECT discord_user_id, discord_server_id, amount, 'opening'
+FROM karma
+WHERE amount IS NOT NULL AND amount <> 0
+  AND NOT EXISTS (SELECT 1 FROM karma_ledger);
+
+CREATE TABLE IF NOT EXISTS karma_daily (
+  discord_server_id BIGINT NOT NULL,
+  discord_user_id BIGINT NOT NULL,
+  day DATE NOT NULL,
+  gained BIGINT NOT NULL DEFAULT 0,
+  lost BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (discord_server_id, discord_user_id, day)
+);
+
+-- Daily rollups start out as the aggregate of the existing ledger. Opening balances were not gained on their day.
+INSERT INTO karma_daily (discord_server_id, discord_user_id, day, gained, lost)
+SELECT discord_server_id, discord_user_id, created_at::date,
+       SUM(GREATEST(amount, 0)), SUM(GREATEST(-amount, 0))
+FROM karma_ledger
+WHERE reason <> 'opening'
+  AND NOT EXISTS (SELECT 1 FROM karma_daily)
+GROUP BY discord_server_id, discord_user_id, created_at::date;
+
 CREATE TABLE IF NOT EXISTS post (
   discord_message_id BIGINT PRIMARY KEY,
   discord_user_id BIGINT REFERENCES discord_user(discord_user_id),
@@ -74,6 +117,20 @@ CREATE TABLE IF NOT EXISTS post (
   downvotes BIGINT DEFAULT 0
 );
 
+CREATE INDEX IF NOT EXISTS post_discord_server_id_created_at_upvotes_idx
+ON post (discord_server_id, created_at, upvotes DESC);
+
+CREATE TABLE IF NOT EXISTS post_reconciliation (
+  discord_server_id BIGINT PRIMARY KEY REFERENCES discord_server(discord_server_id) ON DELETE CASCADE,
+  phase VARCHAR(10) NOT NULL DEFAULT 'posts' CHECK (phase IN ('posts', 'history')),
+  last_message_id BIGINT NOT NULL DEFAULT 0,
+  last_channel_id BIGINT NOT NULL DEFAULT 0,
+  checked_posts BIGINT NOT NULL DEFAULT 0,
+  corrected_posts BIGINT NOT NULL DEFAULT 0,
+  started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  finished_at TIMESTAMP
+);
+
 CREATE TABLE IF NOT EXISTS karma_emote (
   id SERIAL PRIMARY KEY,
   discord_emote_id BIGINT,
@@ -91,9 +148,16 @@ CREATE TABLE IF NOT EXISTS kasino (
   discord_channel_id BIGINT REFERENCES discord_channel(discord_channel_id),
   discord_message_id BIGINT NOT NULL,
   locked BOOLEAN DEFAULT FALSE,
-  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  option1_pool BIGINT NOT NULL DEFAULT 0,
+  option2_pool BIGINT NOT NULL DEFAULT 0,
+  participants BIGINT NOT NULL DEFAULT 0
 );
 
+ALTER TABLE kasino ADD COLUMN IF NOT EXISTS option1_pool BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE kasino ADD COLUMN IF NOT EXISTS option2_pool BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE kasino ADD COLUMN IF NOT EXISTS participants BIGINT NOT NULL DEFAULT 0;
+
 CREATE TABLE IF NOT EXISTS kasino_bet (
   id SERIAL PRIMARY KEY,
   kasino_id BIGINT REFERENCES kasino(id) ON DELETE CASCADE,
@@ -103,6 +167,23 @@ CREATE TABLE IF NOT EXISTS kasino_bet (
   UNIQUE (kasino_id, discord_user_id)
 );
 
+CREATE TABLE IF NOT EXISTS outbox (
+  id BIGSERIAL PRIMARY KEY,
+  kind VARCHAR(20) NOT NULL CHECK (kind IN ('dm', 'message', 'edit')),
+  target_id BIGINT NOT NULL,
+  message_id BIGINT,
+  payload JSONB NOT NULL,
+  dedupe_key VARCHAR(255) UNIQUE,
+  attempts INT NOT NULL DEFAULT 0,
+  last_error TEXT,
+  next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  completed_at TIMESTAMP,
+  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS outbox_pending_idx
+ON outbox (next_attempt_at) WHERE completed_at IS NULL;
+
 CREATE TABLE IF NOT EXISTS feedback (
   id SERIAL PRIMARY KEY,
   discord_user_id BIGINT REFERENCES discord_user(discord_user_id),
@@ -1,2 +1,3 @@
 from . import ux as ux
 from .general import *
+from .ranking import *
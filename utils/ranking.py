@@ -0,0 +1,137 @@
+import random
+
+__all__ = ("RankedIndex",)
+
+
+class _Node:
+	__slots__ = ("key", "priority", "size", "left", "right")
+
+	def __init__(self, key: tuple[int, int]) -> None:
+		self.key = key
+		self.priority = random.random()
+		self.size = 1
+		self.left: _Node | None = None
+		self.right: _Node | None = None
+
+
+def _size(node: _Node | None) -> int:
+	return node.size if node is not None else 0
+
+
+def _update(node: _Node) -> _Node:
+	node.size = 1 + _size(node.left) + _size(node.right)
+	return node
+
+
+def _split(node: _Node | None, key: tuple[int, int]) -> tuple[_Node | None, _Node | None]:
+	"""Splits a treap into nodes with keys lower than `key` and nodes with keys greater or equal."""
+	if node is None:
+		return None, None
+	if node.key < key:
+		lower, upper = _split(node.right, key)
+		node.right = lower
+		return _update(node), upper
+	lower, upper = _split(node.left, key)
+	node.left = upper
+	return lower, _update(node)
+
+
+def _merge(lower: _Node | None, upper: _Node | None) -> _Node | None:
+	if lower is None:
+		return upper
+	if upper is None:
+		return lower
+	if lower.priority > upper.priority:
+		lower.right = _merge(lower.right, upper)
+		return _update(lower)
+	upper.left = _merge(lower, upper.left)
+	return _update(upper)
+
+
+def _erase(node: _Node | None, key: tuple[int, int]) -> _Node | None:
+	if node is None:
+		return None
+	if node.key == key:
+		return _merge(node.left, node.right)
+	if key < node.key:
+		node.left = _erase(node.left, key)
+	else:
+		node.right = _erase(node.right, key)
+	return _update(node)
+
+
+class RankedIndex:
+	"""Order-statistic treap of user amounts, ranked by amount descending and user id ascending.
+
+	Updates, rank lookups and positional access are O(log n).
+	"""
+
+	def __init__(self) -> None:
+		self._root: _Node | None = None
+		self._amounts: dict[int, int] = {}
+
+	def get(self, user_id: int) -> int | None:
+		return self._amounts.get(user_id)
+
+	def set(self, user_id: int, amount: int) -> None:
+		previous = self._amounts.get(user_id)
+		if previous == amount:
+			return
+		if previous is not None:
+			self._root = _erase(self._root, (-previous, user_id))
+		self._amounts[user_id] = amount
+		lower, upper = _split(self._root, (-amount, user_id))
+		self._root = _merge(_merge(lower, _Node((-amount, user_id))), upper)
+
+	def add(self, user_id: int, delta: int) -> int:
+		amount = self._amounts.get(user_id, 0) + delta
+		self.set(user_id, amount)
+		return amount
+
+	def remove(self, user_id: int) -> None:
+		previous = self._amounts.pop(user_id, None)
+		if previous is not None:
+			self._root = _erase(self._root, (-previous, user_id))
+
+	def rank(self, user_id: int) -> int | None:
+		"""Returns the 1-based position of the user, or None if the user is not ranked."""
+		amount = self._amounts.get(user_id)
+		if amount is None:
+			return None
+		key = (-amount, user_id)
+		position = 0
+		node = self._root
+		while node is not None:
+			if key < node.key:
+				node = node.left
+			elif key > node.key:
+				position += _size(node.left) + 1
+				node = node.right
+			else:
+				return position + _size(node.left) + 1
+		return None
+
+	def at(self, index: int) -> tuple[int, int]:
+		"""Returns the (user_id, amount) at the 0-based position."""
+		if not 0 <= index < len(self):
+			raise IndexError("ranked index out of range")
+		node = self._root
+		while node is not None:
+			left_size = _size(node.left)
+			if index < left_size:
+				node = node.left
+			elif index > left_size:
+				index -= left_size + 1
+				node = node.right
+			else:
+				return node.key[1], -node.key[0]
+		raise IndexError("ranked index out of range")
+
+	def page(self, offset: int, limit: int) -> list[tuple[int, int]]:
+		return [self.at(index) for index in range(max(offset, 0), min(offset + limit, len(self)))]
+
+	def __len__(self) -> int:
+		return _size(self._root)
+
+	def __contains__(self, user_id: int) -> bool:
+		return user_id in self._amounts
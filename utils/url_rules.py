@@ -4,11 +4,11 @@ import json
 import logging
 import re
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import timedelta
 from pathlib import Path
 from typing import Any
-from urllib.parse import parse_qsl, unquote, urlencode, urlparse, urlsplit, urlunsplit
+from urllib.parse import unquote, urlparse, urlsplit
 
 import aiohttp
 
@@ -18,6 +18,38 @@ CLEARURLS_RULES_URL = "https://raw.githubusercontent.com/ClearURLs/Rules/master/
 RULES_CACHE_PATH = Path("cache/url_rules_cache.json")
 RULES_CACHE_MAX_AGE = timedelta(hours=24)
 
+# Start of a ClearURLs urlPattern that is anchored to the scheme, optionally followed by any subdomains.
+_ANCHORED_HOST_PREFIX = re.compile(r"\^https\?:\\/\\/(?:\(\?:\[a-z0-9-\]\+\\\.\)\*\??)?")
+# Literal first host label of the pattern and what must follow it for the label to end there.
+_HOST_LABEL = re.compile(
+	r"((?:[a-z0-9]|\\?-)+)(?:\\[./](?![?*{])|\(\?:\\\.\[a-z\]\{2,\}\)(?:\{1,\}|\+))", re.IGNORECASE
+)
+_URL_HOST = re.compile(r"https?://([a-z0-9.-]*)", re.IGNORECASE)
+# Group references depend on group numbering, which changes when patterns are fused into one alternation.
+_GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+
+@dataclass(slots=True)
+class ParameterMatcher:
+	"""Classifies query parameter names against a provider's rules with a set lookup and one fused regex.
+
+	Matching is equivalent to `any(pattern.fullmatch(name) for pattern in patterns)` with case-insensitive patterns.
+	"""
+
+	names: frozenset[str] = frozenset()
+	pattern: re.Pattern[str] | None = None
+	full_pattern: re.Pattern[str] | None = None
+	unfused: tuple[re.Pattern[str], ...] = ()
+
+	def matches(self, name: str) -> bool:
+		if name.isascii():
+			# Case-insensitive ASCII literals only match ASCII names that are equal when lowercased.
+			if name.lower() in self.names or (self.pattern is not None and self.pattern.fullmatch(name)):
+				return True
+		elif self.full_pattern is not None and self.full_pattern.fullmatch(name):
+			return True
+		return any(pattern.fullmatch(name) for pattern in self.unfused)
+
 
 @dataclass(slots=True)
 class CompiledProvider:
@@ -29,6 +61,8 @@ class CompiledProvider:
 	exceptions: tuple[re.Pattern[str], ...]
 	redirections: tuple[re.Pattern[str], ...]
 	force_redirection: bool
+	host_label: str | None = None
+	parameters: ParameterMatcher = field(default_factory=ParameterMatcher)
 
 
 def _compile_patterns(patterns: Any) -> tuple[re.Pattern[str], ...]:
@@ -48,6 +82,104 @@ def _compile_patterns(patterns: Any) -> tuple[re.Pattern[str], ...]:
 	return tuple(compiled_patterns)
 
 
+def _literal_pattern(pattern: str) -> str | None:
+	"""Returns the text a pattern matches if it has no regex syntax apart from escaped punctuation."""
+	literal: list[str] = []
+	escaped = False
+	for char in pattern:
+		if escaped:
+			if char.isalnum():
+				return None
+			literal.append(char)
+			escaped = False
+		elif char == "\\":
+			escaped = True
+		elif char in ".^$*+?{}[]|()":
+			return None
+		else:
+			literal.append(char)
+	return None if escaped else "".join(literal)
+
+
+def _fuse_patterns(patterns: list[re.Pattern[str]]) -> re.Pattern[str] | None:
+	if not patterns:
+		return None
+	return re.compile("|".join(f"(?:{pattern.pattern})" for pattern in patterns), re.IGNORECASE)
+
+
+def _compile_parameter_matcher(patterns: tuple[re.Pattern[str], ...]) -> ParameterMatcher:
+	names: set[str] = set()
+	residual: list[re.Pattern[str]] = []
+	fusable: list[re.Pattern[str]] = []
+	unfused: list[re.Pattern[str]] = []
+	for pattern in patterns:
+		if _GROUP_REFERENCE.search(pattern.pattern):
+			unfused.append(pattern)
+			continue
+		fusable.append(pattern)
+		literal = _literal_pattern(pattern.pattern)
+		if literal is not None and literal.isascii():
+			names.add(literal.lower())
+		else:
+			residual.append(pattern)
+
+	try:
+		return ParameterMatcher(frozenset(names), _fuse_patterns(residual), _fuse_patterns(fusable), tuple(unfused))
+	except re.error:
+		# Patterns with inline global flags or duplicate group names cannot be fused, match them one by one.
+		return ParameterMatcher(unfused=patterns)
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+	depth = 0
+	in_class = False
+	escaped = False
+	for char in pattern:
+		if escaped:
+			escaped = False
+		elif char == "\\":
+			escaped = True
+		elif in_class:
+			in_class = char != "]"
+		elif char == "[":
+			in_class = True
+		elif char == "(":
+			depth += 1
+		elif char == ")":
+			depth -= 1
+		elif char == "|" and depth == 0:
+			return True
+	return False
+
+
+def _extract_host_label(url_pattern: str) -> str | None:
+	"""Returns a host label every URL matched by the pattern contains, or None if the pattern can match any host.
+
+	Only patterns anchored to the scheme whose host starts with a literal label qualify, for example
+	`^https?:\\/\\/(?:[a-z0-9-]+\\.)*?amazon\\.com` yields `amazon`.
+	"""
+	prefix = _ANCHORED_HOST_PREFIX.match(url_pattern)
+	if prefix is None or _has_top_level_alternation(url_pattern):
+		return None
+	label = _HOST_LABEL.match(url_pattern, prefix.end())
+	if label is None:
+		return None
+	return label.group(1).replace("\\", "").lower()
+
+
+def _url_host_labels(url: str) -> list[str] | None:
+	"""Splits the host of the URL the way the anchored provider patterns see it.
+
+	Returns None for non-ASCII URLs, where case-insensitive matching of `[a-z]` is not limited to ASCII letters.
+	"""
+	if not url.isascii():
+		return None
+	match = _URL_HOST.match(url)
+	if match is None:
+		return []
+	return match.group(1).lower().split(".")
+
+
 def _validate_payload(payload: Any) -> dict[str, Any]:
 	if not isinstance(payload, dict) or not isinstance(payload.get("providers"), dict):
 		raise ValueError("Rules payload must contain a providers object")
@@ -71,16 +203,20 @@ def compile_rules(payload: dict[str, Any]) -> list[CompiledProvider]:
 		except re.error:
 			continue
 
+		rules = _compile_patterns(provider.get("rules"))
+		referral_marketing = _compile_patterns(provider.get("referralMarketing"))
 		compiled_providers.append(
 			CompiledProvider(
 				name=name,
 				url_pattern=compiled_url_pattern,
-				rules=_compile_patterns(provider.get("rules")),
-				referral_marketing=_compile_patterns(provider.get("referralMarketing")),
+				rules=rules,
+				referral_marketing=referral_marketing,
 				raw_rules=_compile_patterns(provider.get("rawRules")),
 				exceptions=_compile_patterns(provider.get("exceptions")),
 				redirections=_compile_patterns(provider.get("redirections")),
 				force_redirection=bool(provider.get("forceRedirection", False)),
+				host_label=_extract_host_label(url_pattern),
+				parameters=_compile_parameter_matcher(rules + referral_marketing),
 			)
 		)
 
@@ -158,6 +294,25 @@ class URLRulesCleaner:
 	def __init__(self, providers: list[CompiledProvider]):
 		self.providers = providers
 		self.url_pattern = re.compile(r"(https?://[^\s<]+[^<.,:;\"'>)\]\s])")
+		# Providers are indexed by position, so candidates can be run in the original rule order.
+		self.generic_providers: list[int] = []
+		self.providers_by_host_label: dict[str, list[int]] = {}
+		for position, provider in enumerate(providers):
+			if provider.host_label is None:
+				self.generic_providers.append(position)
+			else:
+				self.providers_by_host_label.setdefault(provider.host_label, []).append(position)
+
+	def _candidate_providers(self, url: str, after: int) -> list[int]:
+		"""Returns the positions after `after` of the providers whose url_pattern can match the URL."""
+		labels = _url_host_labels(url)
+		if labels is None:
+			return list(range(after + 1, len(self.providers)))
+
+		candidates = set(self.generic_providers)
+		for label in labels:
+			candidates.update(self.providers_by_host_label.get(label, ()))
+		return sorted(position for position in candidates if position > after)
 
 	def replace_url(self, url: str) -> tuple[str, list[str], bool]:
 		try:
@@ -169,7 +324,22 @@ class URLRulesCleaner:
 		removed_trackers: list[str] = []
 		was_redirected = False
 
-		for provider in self.providers:
+		position = -1
+		candidates: list[int] = []
+		candidates_url = None
+		next_candidate = 0
+		while True:
+			# Redirections and removals can change the host, the remaining candidates are looked up again then.
+			if current_url != candidates_url:
+				candidates = self._candidate_providers(current_url, position)
+				candidates_url = current_url
+				next_candidate = 0
+			if next_candidate >= len(candidates):
+				break
+			position = candidates[next_candidate]
+			next_candidate += 1
+			provider = self.providers[position]
+
 			if not provider.url_pattern.search(current_url):
 				continue
 
@@ -238,33 +408,54 @@ class URLRulesCleaner:
 
 	def _remove_tracking_from_url(self, url: str, provider: CompiledProvider) -> tuple[str, list[str]]:
 		try:
-			parsed_url = urlsplit(url)
+			urlsplit(url)
 		except ValueError:
 			return url, []
 
-		patterns = provider.rules + provider.referral_marketing
-		removed_params: list[str] = []
-		filtered_query: list[tuple[str, str]] = []
-
-		for key, value in parse_qsl(parsed_url.query, keep_blank_values=True):
-			if any(pattern.fullmatch(key) for pattern in patterns):
-				removed_params.append(key)
-				continue
-			filtered_query.append((key, value))
-
 		updated_url = url
-		if removed_params:
-			updated_url = urlunsplit(
-				(
-					parsed_url.scheme,
-					parsed_url.netloc,
-					parsed_url.path,
-					urlencode(filtered_query, doseq=True),
-					parsed_url.fragment,
-				)
-			)
+		removed_params: list[str] = []
+		query_end = url.find("#")
+		if query_end == -1:
+			query_end = len(url)
+		query_start = url.find("?", 0, query_end) + 1
+		if query_start:
+			kept_query, removed_params = self._remove_query_parameters(url, query_start, query_end, provider)
+			if removed_params and kept_query:
+				updated_url = url[:query_start] + kept_query + url[query_end:]
+			elif removed_params:
+				# Without any parameters left the "?" is dropped as well.
+				updated_url = url[: query_start - 1] + url[query_end:]
 
 		for raw_rule in provider.raw_rules:
 			updated_url = raw_rule.sub("", updated_url)
 
 		return updated_url, removed_params
+
+	def _remove_query_parameters(
+		self, url: str, start: int, end: int, provider: CompiledProvider
+	) -> tuple[str, list[str]]:
+		"""Splices the tracking parameters out of the query in `url[start:end]`.
+
+		Keys are decoded like `parse_qsl` does, the kept parameters are copied without re-encoding them.
+		"""
+		removed_params: list[str] = []
+		kept_spans: list[tuple[int, int]] = []
+		field_start = start
+		while field_start <= end:
+			field_end = url.find("&", field_start, end)
+			if field_end == -1:
+				field_end = end
+			if field_end > field_start:
+				key_end = url.find("=", field_start, field_end)
+				key = url[field_start : field_end if key_end == -1 else key_end]
+				if "+" in key or "%" in key:
+					key = unquote(key.replace("+", " "))
+				if provider.parameters.matches(key):
+					removed_params.append(key)
+				else:
+					kept_spans.append((field_start, field_end))
+			field_start = field_end + 1
+
+		if not removed_params:
+			return url[start:end], removed_params
+		return "&".join(url[span_start:span_end] for span_start, span_end in kept_spans), removed_params